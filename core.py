@@ -4,7 +4,7 @@ from typing import Optional, Tuple, Any
 from disnake.ext import commands
 from datetime import datetime
 from pathlib import Path
-import importlib.util
+import importlib
 import subprocess
 import logging
 import asyncio
@@ -140,6 +140,14 @@ class BotManager:
     def __init__(self, client: commands.Bot):
         self.client = client
 
+    async def prepare_shutdown(self) -> None:
+        for name, cog in list(self.client.cogs.items()):
+            if hook := getattr(cog, 'before_shutdown', None):
+                try:
+                    await hook()
+                except Exception as e:
+                    logging.error(f"Error preparing {name} for shutdown: {e}")
+
     async def restart_bot(self, inter: disnake.MessageInteraction) -> None:
         try:
             config.update('restart_channel_id', str(inter.channel.id))
@@ -149,6 +157,7 @@ class BotManager:
                 await inter.response.edit_message(content="Restarting...")
             else:
                 await inter.edit_original_message(content="Restarting...")
+            await self.prepare_shutdown()
             subprocess.Popen([sys.executable, str(Path(__file__).resolve())])
             await self.client.close()
         except Exception as e:
@@ -171,6 +180,7 @@ class BotManager:
                 code, _, stderr = await GitManager.run_cmd(*cmd)
                 if code != 0:
                     raise Exception(f"Git command failed: {' '.join(cmd)}, Error: {stderr}")
+            await self.prepare_shutdown()
             for cog in list(self.client.cogs.keys()):
                 self.client.remove_cog(cog)
             ModuleLoader.load_all_modules(self.client)
@@ -235,29 +245,25 @@ class ModuleLoader:
         return modules
 
     @staticmethod
-    def load_single_module(client: commands.Bot, file_path: Path, name: str) -> None:
+    def load_single_module(client: commands.Bot, name: str) -> None:
         try:
-            spec = importlib.util.spec_from_file_location(name, file_path)
-            if not spec or not spec.loader:
-                raise ImportError(f"Failed to load spec for {name}")
-            module = importlib.util.module_from_spec(spec)
-            sys.modules[name] = module
-            try:
-                spec.loader.exec_module(module)
-            except Exception as e:
-                del sys.modules[name]
-                raise e
+            module = importlib.import_module(name)
             for attr_name in dir(module):
                 attr = getattr(module, attr_name)
                 if isinstance(attr, type) and issubclass(attr, commands.Cog) and attr is not commands.Cog:
                     client.add_cog(attr(client))
         except Exception as e:
-            if name in sys.modules:
-                del sys.modules[name]
             logging.error(f"Error loading module {name}: {e}", exc_info=True)
 
+    @staticmethod
+    def unload_all_modules() -> None:
+        for name in [name for name in sys.modules if name == 'modules' or name.startswith('modules.')]:
+            del sys.modules[name]
+        importlib.invalidate_caches()
+
     @classmethod
     def load_all_modules(cls, client: commands.Bot, cogs_dir: Path = CONFIG['COGS_DIR']) -> None:
+        cls.unload_all_modules()
         for file_path in Path(cogs_dir).rglob("*.py"):
             if file_path.stem == "__init__": continue
             relative_parts = file_path.relative_to(cogs_dir).parts
@@ -266,7 +272,7 @@ class ModuleLoader:
                 if len(relative_parts) > 1 
                 else f"modules.{file_path.stem}"
             )
-            cls.load_single_module(client, file_path, module_name)
+            cls.load_single_module(client, module_name)
 
     @staticmethod
     async def download_module(category: str, filename: str) -> bool:
@@ -552,6 +558,7 @@ class ControlPanelView(disnake.ui.View):
             async def interaction_check(self, inter: disnake.MessageInteraction) -> bool:
                 if inter.component.custom_id == "confirm_shutdown_yes":
                     await inter.response.edit_message(content="Shutting down...", view=None)
+                    await bot_manager.prepare_shutdown()
                     await client.close()
                 else:
                     await inter.response.edit_message(content=f"🤖 {client.user.display_name} Control Panel", view=ControlPanelView())
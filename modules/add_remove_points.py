@@ -1,10 +1,11 @@
 # modules.add_remove_points
 
 from modules.utils.progression import calculate_user_rank_and_next_rank_name, create_points_embed, role_thresholds
-from modules.utils.database import initialize_points_database, update_points, get_user_points
+from modules.utils.database import add_points, get_user_points, get_points_ledger, rebuild_user_points
 from modules.roles import check_user_points
 from disnake.ext import commands
 from disnake import User
+import datetime
 import logging
 
 class PointsCog(commands.Cog):
@@ -21,16 +22,44 @@ class PointsCog(commands.Cog):
     async def remove(self, ctx, points: int, user: User, reason: str = None):
         await self.handle_points_command(ctx, points, user, "remove", reason)
 
+    @commands.slash_command(description="Show recent point changes for a user")
+    @commands.has_permissions(administrator=True)
+    async def points_history(self, ctx, user: User, limit: int = 10):
+        entries = await get_points_ledger(user.id, max(1, min(limit, 25)))
+        if not entries:
+            await ctx.send(f"No point changes recorded for {user.display_name}.")
+            return
+        lines = []
+        for delta, source, message_id, actor_id, timestamp in entries:
+            when = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+            line = f"{when}  {delta:+d}  {source}"
+            if actor_id:
+                line += f"  by {actor_id}"
+            if message_id:
+                line += f"  msg {message_id}"
+            lines.append(line)
+        await ctx.send(f"Recent point changes for {user.display_name}:\n```\n" + "\n".join(lines) + "\n```")
+
+    @commands.slash_command(description="Recalculate a user's points from the ledger")
+    @commands.has_permissions(administrator=True)
+    async def rebuild_points(self, ctx, user: User):
+        old_points = await get_user_points(user.id)
+        new_points = await rebuild_user_points(user.id)
+        logging.info(f"Rebuilt points for {user}: {old_points} -> {new_points}")
+        if new_points != old_points:
+            await check_user_points(self.bot)
+        await ctx.send(f"{user.display_name} now has {new_points} points (was {old_points}).")
+
     async def handle_points_command(self, ctx, points, user, action, reason):
         logging.info(f"{action.capitalize()}ing points: Points: {points}, User: {user}")
         if points < 0:
             logging.error("Invalid points.")
             await ctx.send("Points must be a positive number.")
             return
-        await initialize_points_database(user)
-        current_points = await get_user_points(user.id)
-        new_points = current_points + points if action == "add" else current_points - points
-        if await update_points(user.id, new_points):
+        new_points = await add_points(user.id, points if action == "add" else -points, f"command:{action}", actor_id=ctx.author.id)
+        if new_points is None:
+            new_points = await get_user_points(user.id)
+        else:
             await check_user_points(self.bot)
         user_rank, next_rank_name, _, _, _ = await calculate_user_rank_and_next_rank_name(ctx, user, role_thresholds)
         new_embed = await create_points_embed(ctx, user, new_points, role_thresholds, action, user_rank, next_rank_name, points, f"Reason: {reason}" if reason else None)
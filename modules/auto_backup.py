@@ -1,10 +1,12 @@
 # modules.auto_backup
 
 from datetime import datetime, timedelta, timezone
-from modules.utils.database import DATABASE_FILE
+from modules.utils.database import DATABASE_FILE, backup_database
 from core import Config, CONFIG
 from disnake.ext import commands
 from disnake import Embed, Color
+from pathlib import Path
+import tempfile
 import asyncio
 import logging
 import aiohttp
@@ -23,8 +25,10 @@ class GitHubBackup:
 
     async def backup(self) -> tuple[bool, str]:
         try:
-            with open(self.db_file, 'rb') as f:
-                content = base64.b64encode(f.read()).decode()
+            with tempfile.TemporaryDirectory() as directory:
+                snapshot = Path(directory) / Path(self.db_file).name
+                await backup_database(str(snapshot))
+                content = base64.b64encode(snapshot.read_bytes()).decode()
             async with aiohttp.ClientSession() as session:
                 filename = self.db_file.split('/')[-1]
                 url = f'https://api.github.com/repos/{self.owner}/{self.repo}/contents/{filename}'
@@ -1,7 +1,9 @@
 # modules.emoji
 
 from disnake import Embed, ButtonStyle, Color, PartialEmoji, RawReactionActionEvent, Message, Thread, User
-from modules.utils.database import db_access_with_retry, update_points, log_checkmark_message_id
+from modules.utils.database import db_access_with_retry, add_points, log_checkmark_message_id, get_points_reply, save_points_reply
+from modules.utils.messages import fetch_message
+from modules.utils.locks import KeyedLock
 from disnake.ui import View, Button
 from disnake.ext import commands
 from typing import List, Tuple
@@ -12,6 +14,7 @@ import time
 
 ADMIN_USER_ID = 126123710435295232
 ROLE_ID = 1221297807214776381
+REPLY_DEBOUNCE = 2.0
 
 EMOJI_ACTIONS = {
     "✅": "handle_checkmark_reaction"
@@ -34,8 +37,9 @@ EMOJI_RESPONSES = {
 class EmojiCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.bot_replies = {}
-        self.reaction_lock = asyncio.Lock()
+        self.message_locks = KeyedLock()
+        self.pending_replies = {}
+        self.reply_tasks = {}
         self.max_retries = 3
         self.retry_delay = 1
 
@@ -73,23 +77,26 @@ class EmojiCog(commands.Cog):
         if payload.guild_id is None:
             return
         emoji_name = str(payload.emoji)
-        async with self.reaction_lock:
-            for _ in range(self.max_retries):
-                try:
-                    if emoji_name in EMOJI_POINTS:
-                        await self.process_emoji_points(payload, is_add)
-                    elif emoji_name in EMOJI_ACTIONS and is_add:
-                        await getattr(self, EMOJI_ACTIONS[emoji_name])(payload)
-                    break
-                except disnake.errors.HTTPException as e:
-                    if e.code == 429:
-                        await asyncio.sleep(self.retry_delay)
-                    else:
-                        logging.error(f"HTTP error processing reaction: {e}")
-                        break
-                except Exception as e:
-                    logging.error(f"Error processing reaction: {e}")
+        if emoji_name in EMOJI_POINTS:
+            handler = lambda: self.process_emoji_points(payload, is_add)
+        elif emoji_name in EMOJI_ACTIONS and is_add:
+            handler = lambda: getattr(self, EMOJI_ACTIONS[emoji_name])(payload)
+        else:
+            return
+        for _ in range(self.max_retries):
+            try:
+                async with self.message_locks(payload.message_id):
+                    await handler()
+                break
+            except disnake.errors.HTTPException as e:
+                if e.code == 429:
+                    await asyncio.sleep(self.retry_delay)
+                else:
+                    logging.error(f"HTTP error processing reaction: {e}")
                     break
+            except Exception as e:
+                logging.error(f"Error processing reaction: {e}")
+                break
 
     async def process_emoji_points(self, payload: RawReactionActionEvent, is_add: bool):
         guild = self.bot.get_guild(payload.guild_id)
@@ -98,57 +105,105 @@ class EmojiCog(commands.Cog):
             return
         message = await self.fetch_message(payload)
         user_id = message.author.id
-        new_points = await self.update_user_points(user_id, payload.emoji, is_add)
-        await self.update_bot_reply(message, new_points, str(payload.emoji), is_add)
+        await self.update_user_points(user_id, payload.emoji, is_add, message.id, payload.user_id)
+        self.schedule_bot_reply(message, str(payload.emoji), is_add)
 
-    async def update_user_points(self, user_id: int, emoji: PartialEmoji, is_add: bool) -> int:
+    async def update_user_points(self, user_id: int, emoji: PartialEmoji, is_add: bool, message_id: int = None, actor_id: int = None) -> int:
         points_to_change = EMOJI_POINTS[str(emoji)]
-        user_points = await self.get_user_points(user_id)
-        new_points = user_points + (points_to_change if is_add else -points_to_change)
-        if await update_points(user_id, new_points):
-            return new_points
-        return user_points
+        new_points = await add_points(
+            user_id,
+            points_to_change if is_add else -points_to_change,
+            f"reaction:{emoji}",
+            message_id,
+            actor_id
+        )
+        if new_points is None:
+            return await self.get_user_points(user_id)
+        return new_points
 
     async def fetch_message(self, payload: RawReactionActionEvent) -> Message:
         channel = self.bot.get_channel(payload.channel_id)
-        return await channel.fetch_message(payload.message_id)
-
-    async def update_bot_reply(self, message: Message, total_points: int, emoji: str, is_add: bool):
-        reply_info = self.bot_replies.get(message.id, {'reply_id': None, 'total_points': 0, 'reasons': []})
-        reason_tuple = (emoji, EMOJI_RESPONSES[emoji])
-        if is_add:
-            if reason_tuple not in reply_info['reasons']:
-                reply_info['reasons'].append(reason_tuple)
-                reply_info['total_points'] += EMOJI_POINTS[emoji]
-        else:
-            if reason_tuple in reply_info['reasons']:
-                reply_info['reasons'].remove(reason_tuple)
-                reply_info['total_points'] -= EMOJI_POINTS[emoji]
+        return await fetch_message(self.bot, channel, payload.message_id)
+
+    async def before_shutdown(self):
+        for task in self.reply_tasks.values():
+            task.cancel()
+        self.reply_tasks.clear()
+        for message_id in list(self.pending_replies):
+            async with self.message_locks(message_id):
+                pending = self.pending_replies.pop(message_id, None)
+                if pending:
+                    await self.update_bot_reply(pending['message'], pending['changes'])
+
+    def schedule_bot_reply(self, message: Message, emoji: str, is_add: bool):
+        pending = self.pending_replies.setdefault(message.id, {'message': message, 'changes': []})
+        pending['message'] = message
+        pending['changes'].append((emoji, is_add))
+        if message.id not in self.reply_tasks:
+            self.reply_tasks[message.id] = asyncio.create_task(self.flush_bot_reply(message.id))
+
+    async def flush_bot_reply(self, message_id: int):
+        try:
+            await asyncio.sleep(REPLY_DEBOUNCE)
+            async with self.message_locks(message_id):
+                del self.reply_tasks[message_id]
+                pending = self.pending_replies.pop(message_id, None)
+                if pending:
+                    await self.update_bot_reply(pending['message'], pending['changes'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error flushing points reply for {message_id}: {e}")
+        finally:
+            if self.reply_tasks.get(message_id) is asyncio.current_task():
+                del self.reply_tasks[message_id]
+
+    async def update_bot_reply(self, message: Message, changes: List[Tuple[str, bool]]):
+        reply_info = await self.get_reply_info(message.id)
+        reasons = list(reply_info['reasons'])
+        total_points = reply_info['total_points']
+        for emoji, is_add in changes:
+            reason_tuple = (emoji, EMOJI_RESPONSES[emoji])
+            if is_add and reason_tuple not in reasons:
+                reasons.append(reason_tuple)
+                total_points += EMOJI_POINTS[emoji]
+            elif not is_add and reason_tuple in reasons:
+                reasons.remove(reason_tuple)
+                total_points -= EMOJI_POINTS[emoji]
+        if reasons == reply_info['reasons'] or not (reasons or reply_info['reply_id']):
+            return
+        reply_info = {'reply_id': reply_info['reply_id'], 'total_points': total_points, 'reasons': reasons}
         embed = self.create_points_embed(message.author, reply_info['total_points'], reply_info['reasons'])
         try:
             if reply_info['reply_id']:
-                existing_reply = await message.channel.fetch_message(reply_info['reply_id'])
-                await existing_reply.edit(embed=embed)
+                await message.channel.get_partial_message(reply_info['reply_id']).edit(embed=embed)
             else:
                 new_reply = await message.reply(embed=embed)
                 reply_info['reply_id'] = new_reply.id
-            self.bot_replies[message.id] = reply_info
         except disnake.errors.NotFound:
             new_reply = await message.reply(embed=embed)
             reply_info['reply_id'] = new_reply.id
-            self.bot_replies[message.id] = reply_info
         except Exception as e:
             logging.error(f"Error updating bot reply: {e}")
+            return
+        await save_points_reply(
+            message.id,
+            message.channel.id,
+            reply_info['reply_id'],
+            reply_info['total_points'],
+            [emoji for emoji, _ in reply_info['reasons']]
+        )
 
-    async def find_existing_reply(self, message: Message) -> Message | None:
-        async for msg in message.channel.history(limit=10, after=message):
-            if (msg.author == self.bot.user and 
-                msg.reference and 
-                msg.reference.message_id == message.id and
-                msg.embeds and 
-                msg.embeds[0].title == "Points Updated"):
-                return msg
-        return None
+    async def get_reply_info(self, message_id: int) -> dict:
+        stored = await get_points_reply(message_id)
+        if stored is None:
+            return {'reply_id': None, 'total_points': 0, 'reasons': []}
+        reply_id, total_points, emojis = stored
+        return {
+            'reply_id': reply_id,
+            'total_points': total_points,
+            'reasons': [(emoji, EMOJI_RESPONSES[emoji]) for emoji in emojis if emoji in EMOJI_RESPONSES]
+        }
 
     async def get_user_points(self, user_id: int) -> int:
         user_points_dict = await db_access_with_retry('SELECT points FROM user_points WHERE user_id = ?', (user_id,))
@@ -173,7 +228,7 @@ class EmojiCog(commands.Cog):
         if user.guild_permissions.administrator or user.id == ADMIN_USER_ID or authorized_role in user.roles:
             channel = self.bot.get_channel(payload.channel_id)
             if isinstance(channel, Thread):
-                message = await channel.fetch_message(payload.message_id)
+                message = await fetch_message(self.bot, channel, payload.message_id)
                 embed = Embed(
                     title="Issue/Request Resolution",
                     description="@here, this issue/request has been marked as *resolved!*\nNo further action is needed.\nThis thread will be automatically deleted in *7 days*.",
@@ -188,7 +243,7 @@ class EmojiCog(commands.Cog):
 
     async def handle_feedback_reaction(self, payload: RawReactionActionEvent, title: str, description: str, color: Color):
         channel = self.bot.get_channel(payload.channel_id)
-        message = await channel.fetch_message(payload.message_id)
+        message = await fetch_message(self.bot, channel, payload.message_id)
         if message.author.id == self.bot.user.id:
             embed = Embed(title=title, description=description, color=color)
             await message.reply(embed=embed)
@@ -1,5 +1,6 @@
 # modules.on_thread_create
 
+from modules.utils.messages import fetch_message, remember_message
 from disnake.ui import Button, View
 from disnake.ext import commands
 import logging
@@ -44,7 +45,7 @@ class ThreadCreateCog(commands.Cog):
             await self.message.edit(embed=done_embed, view=None)
 
     async def handle_bug_report(self, thread):
-        original_message = await thread.fetch_message(thread.id)
+        original_message = await fetch_message(self.bot, thread, thread.id)
         embed = disnake.Embed(
             title="Bug Report Assistance",
             description=(
@@ -72,6 +73,7 @@ class ThreadCreateCog(commands.Cog):
                     first_non_bot_message = message
                     break
             if first_non_bot_message:
+                remember_message(self.bot, first_non_bot_message)
                 await asyncio.gather(*(self.add_reaction(first_non_bot_message, emoji) for emoji in emojis_to_add))
             if thread.parent_id == 1162100167110053888:
                 await self.handle_bug_report(thread)
@@ -1,6 +1,7 @@
 # modules.reactions.kawaii_reactions
 
 from disnake.ext import commands
+from modules.utils.ratelimit import get_model_limiter, PRIORITY_FUN
 from openai import AsyncOpenAI
 from core import Config
 import random
@@ -18,6 +19,8 @@ class KawaiiReactionsCog(commands.Cog):
         'owo': ['OwO!', '*hop*', 'Kero!']
     }
     
+    MAX_QUEUE_WAIT = 5
+
     def __init__(self, bot):
         self.bot = bot
         self.fallback_responses = self.FALLBACK_RESPONSES
@@ -25,7 +28,7 @@ class KawaiiReactionsCog(commands.Cog):
         api_key = Config().read().get('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OpenAI API key not found in config")
-        self.openai_client = AsyncOpenAI(api_key=api_key)
+        self.openai_client = AsyncOpenAI(api_key=api_key, max_retries=0)
 
     async def get_message_history(self, message):
         messages = []
@@ -37,15 +40,19 @@ class KawaiiReactionsCog(commands.Cog):
 
     async def generate_response(self, response_type, message_history):
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPTS[response_type]},
-                    {"role": "user", "content": message_history}
-                ],
-                max_tokens=50,
-                temperature=0.9
-            )
+            estimate = (len(self.SYSTEM_PROMPTS[response_type]) + len(message_history)) // 4 + 50
+            async with get_model_limiter(self.bot).limit(estimate, PRIORITY_FUN, timeout=self.MAX_QUEUE_WAIT) as lease:
+                response = await self.openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": self.SYSTEM_PROMPTS[response_type]},
+                        {"role": "user", "content": message_history}
+                    ],
+                    max_tokens=50,
+                    temperature=0.9
+                )
+                if response.usage:
+                    lease.tokens = response.usage.total_tokens
             return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"OpenAI API error: {e}")
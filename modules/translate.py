@@ -1,49 +1,296 @@
 # modules.translate
 
-from asyncio import Queue, create_task, Task, sleep
-from typing import Dict, Set, List, Union
-from collections import defaultdict
-from modules.utils import database
+from asyncio import create_task, Task, sleep
+from typing import Callable, Dict, Set, List, Union
+from collections import Counter, defaultdict, deque
+from difflib import SequenceMatcher
+from modules.utils.language_state import LanguageState, UserLanguageUsage
+from modules.utils.scheduler import KeyedScheduler
+from modules.utils.cache import TTLCache, ByteLRUCache
+from modules.utils import database, langdetect, ratelimit, segments
+from modules.utils.messages import fetch_message
 from disnake import Embed, Color
 from disnake.ext import commands
 from core import config
 import disnake
+import tiktoken
+import hashlib
+import json
 import asyncio
 import logging
 import openai
+import time
+import sys
+import re
 
 CONSTANTS = {
     'MODEL_NAME': "gpt-4o-mini",
+    'FALLBACK_MODEL_NAME': "gpt-4.1-nano",
     'USAGE_THRESHOLD': 1,
     'PREFERRED_LANG_THRESHOLD': 70,
-    'MAX_HISTORY': 50,
-    'MAX_CACHED_THREADS': 1000,
+    'HISTORY_TOKEN_BUDGET': 2000,
+    'SUMMARY_MAX_TOKENS': 300,
+    'HISTORY_CACHE_MAX_BYTES': 16 * 1024 * 1024,
     'NUM_WORKERS': 3,
+    'MAX_RETRIES': 3,
+    'REQUEST_TIMEOUT': 30,
+    'REQUEST_DEADLINE': 20,
+    'HEDGE_DEFAULT_DELAY': 4.0,
+    'HEDGE_MIN_DELAY': 1.0,
+    'HEDGE_MIN_SAMPLES': 20,
+    'LATENCY_SAMPLES': 200,
+    'TRANSLATION_CACHE_SIZE': 2048,
+    'TRANSLATION_CACHE_TTL': 7 * 24 * 3600,
+    'TRANSLATION_CACHE_MAX_BYTES': 32 * 1024 * 1024,
+    'TRANSLATION_CACHE_MAX_LENGTH': 500,
+    'BATCH_WINDOW': 0.5,
+    'MAX_BATCH_SIZE': 8,
+    'MAX_LANE_DEPTH': 50,
+    'STREAM_TRANSLATIONS': True,
+    'STREAM_EDIT_INTERVAL': 1.5,
+    'EDIT_DEBOUNCE': 1.5,
+    'JOB_VISIBILITY_TIMEOUT': 300,
+    'MAX_JOB_ATTEMPTS': 5,
+    'JOB_RETRY_DELAY': 15,
+    'JOB_RECOVERY_INTERVAL': 60,
+    'JOB_RECOVERY_BATCH': 100,
+    'JOB_MAX_AGE': 3600,
+    'JOB_RETENTION': 7 * 24 * 3600,
+    'LANGUAGE_FLUSH_INTERVAL': 30,
+    'SNAPSHOT_MAX_THREADS': 200,
+    'SNAPSHOT_MAX_USERS': 1000,
+    'LANGUAGE_STATE_MAX_USERS': 5000,
+    'LANGUAGE_STATE_MAX_PREFERENCES': 20000,
+    'SNAPSHOT_MAX_AGE': 24 * 3600,
     'CLEANUP_INTERVAL': 3600
 }
 
-openai_client = openai.OpenAI(api_key=config.read().get('OPENAI_API_KEY'))
+openai_client = openai.AsyncOpenAI(
+    api_key=config.read().get('OPENAI_API_KEY'),
+    timeout=CONSTANTS['REQUEST_TIMEOUT'],
+    max_retries=0
+)
+
+BATCH_BLOCK_MARKER = re.compile(r'^\[(\d+)\]\s*$', re.MULTILINE)
+AUTO_TRANSLATION_TITLE = "🌐 Auto-Translations"
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?。！？])\s+')
 
 COMBINED_PROMPT = """You are a translation assistant. Your job is to:
 1. Detect languages accurately
 2. Translate messages while maintaining context and nuance
 3. Never add commentary or additional messages
 4. Always use full language names (e.g., 'English', 'French', 'Spanish')
-5. Return responses in this format:
+5. Copy placeholders such as [[1]] unchanged; they stand for code, links and other text that must not be translated
+6. Return responses in this format:
    DETECTED:<language_name>
    TRANSLATIONS:
    <language_name>:translated_text
    <language_name>:translated_text"""
 
+SUMMARY_PROMPT = """You maintain a running summary of a conversation that is being translated.
+Merge the existing summary with the new turns into a short paragraph (at most a few sentences).
+Keep participant names, topics, and any terminology needed to translate later messages consistently.
+Return only the summary text."""
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(CONSTANTS['MODEL_NAME'])
+        except Exception as e:
+            logging.warning(f"Falling back to estimated token counts: {e}")
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 4
+    return len(_encoding.encode(text, disallowed_special=())) + 4
+
+TURN_OVERHEAD = sys.getsizeof((None, None, None)) + 8
+HISTORY_OVERHEAD = sys.getsizeof(deque()) + 160
+
+class ThreadHistory:
+    __slots__ = ('summary', 'turns', 'tokens', 'turn_bytes', 'evicted', 'summarizing', 'last_prompt_tokens')
+
+    def __init__(self):
+        self.summary: str | None = None
+        self.turns: deque = deque()
+        self.tokens = 0
+        self.turn_bytes = 0
+        self.evicted: List[tuple] = []
+        self.summarizing = False
+        self.last_prompt_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    @property
+    def size(self) -> int:
+        evicted_bytes = sum(sys.getsizeof(content) + TURN_OVERHEAD for _, content in self.evicted)
+        summary_bytes = sys.getsizeof(self.summary) if self.summary else 0
+        return HISTORY_OVERHEAD + self.turn_bytes + evicted_bytes + summary_bytes
+
+    def append(self, role: str, content: str):
+        tokens = count_tokens(content)
+        self.turns.append((sys.intern(role), content, tokens))
+        self.tokens += tokens
+        self.turn_bytes += sys.getsizeof(content) + TURN_OVERHEAD
+
+    def trim(self, budget: int) -> bool:
+        while self.turns and self.tokens > budget:
+            role, content, tokens = self.turns.popleft()
+            self.tokens -= tokens
+            self.turn_bytes -= sys.getsizeof(content) + TURN_OVERHEAD
+            self.evicted.append((role, content))
+        return bool(self.evicted)
+
+    def to_payload(self) -> str:
+        return json.dumps({
+            'summary': self.summary,
+            'turns': [list(turn) for turn in self.turns]
+        }, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_payload(cls, payload: str) -> 'ThreadHistory':
+        data = json.loads(payload)
+        history = cls()
+        history.summary = data.get('summary')
+        for role, content, tokens in data.get('turns', []):
+            history.turns.append((sys.intern(role), content, tokens))
+            history.tokens += tokens
+            history.turn_bytes += sys.getsizeof(content) + TURN_OVERHEAD
+        return history
+
+    def messages(self) -> List[dict]:
+        messages = [{"role": "system", "content": COMBINED_PROMPT}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation in this thread:\n{self.summary}"})
+        messages.extend({"role": role, "content": content} for role, content, _ in self.turns)
+        return messages
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+def parse_partial_response(text: str) -> tuple[str | None, Dict[str, str], bool]:
+    lines = text.split('\n')
+    if len(lines) < 2 or not lines[0].startswith('DETECTED:'):
+        return None, {}, False
+    detected_lang = lines[0].replace('DETECTED:', '').strip().lower()
+    translations = {}
+    complete = False
+    for number, line in enumerate(lines[2:], 3):
+        if ':' not in line:
+            continue
+        lang, trans = line.split(':', 1)
+        if number < len(lines):
+            complete = True
+        elif trans.strip():
+            trans = f"{trans.strip()} …"
+        translations[lang.strip().lower()] = trans.strip()
+    return detected_lang, translations, complete
+
+class StreamingReply:
+    def __init__(self, cog: 'TranslationCog', message: disnake.Message, content: str):
+        self.cog = cog
+        self.message = message
+        self.content = content
+        self.reply: disnake.Message | None = None
+        self.translations: Dict[str, str] = {}
+        self.shown: Dict[str, str] = {}
+        self.flusher: Task | None = None
+        self.last_edit = 0.0
+
+    def update(self, text: str):
+        detected_lang, translations, complete = parse_partial_response(text)
+        if not complete:
+            return
+        self.translations = {
+            lang: trans
+            for lang, trans in translations.items()
+            if trans and lang != detected_lang and trans.strip() != self.content.strip()
+        }
+        if self.flusher is None or self.flusher.done():
+            self.flusher = create_task(self._flush())
+
+    async def _flush(self):
+        while self.translations and self.translations != self.shown:
+            delay = self.last_edit + CONSTANTS['STREAM_EDIT_INTERVAL'] - time.monotonic()
+            if delay > 0:
+                await sleep(delay)
+                continue
+            await self._render(dict(self.translations))
+
+    async def _render(self, translations: Dict[str, str]):
+        embed = self.cog.create_translation_embed(self.message, self.content, translations)
+        self.shown = translations
+        self.last_edit = time.monotonic()
+        try:
+            if self.reply is None:
+                self.reply = await self.message.reply(embed=embed, mention_author=False)
+            else:
+                await self.reply.edit(embed=embed)
+        except disnake.HTTPException as e:
+            logging.error(f"Failed to send streamed translation: {e}")
+
+    async def finish(self, translations: Dict[str, str]) -> disnake.Message | None:
+        if self.flusher and not self.flusher.done():
+            self.translations = {}
+            await self.flusher
+        if self.reply is None:
+            return await self.cog._send_translation(self.message, self.content, translations)
+        if not translations:
+            await self.abort()
+        elif translations != self.shown:
+            delay = self.last_edit + CONSTANTS['STREAM_EDIT_INTERVAL'] - time.monotonic()
+            if delay > 0:
+                await sleep(delay)
+            await self._render(translations)
+        return self.reply
+
+    async def abort(self):
+        if self.flusher and not self.flusher.done():
+            self.flusher.cancel()
+        if self.reply is not None:
+            try:
+                await self.reply.delete()
+            except disnake.HTTPException as e:
+                logging.error(f"Failed to remove streamed translation: {e}")
+            self.reply = None
+
 class TranslationCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.thread_histories: Dict[int, List[dict]] = {}
-        self.language_usage: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-        self.language_usage_cache = {}
-        self.translation_queue = Queue()
+        self.thread_histories = ByteLRUCache(CONSTANTS['HISTORY_CACHE_MAX_BYTES'], lambda history: history.size)
+        self.request_stats: Dict[str, int] = defaultdict(int)
+        self.hedge_stats: Dict[str, int] = defaultdict(int)
+        self.latency_samples: deque = deque(maxlen=CONSTANTS['LATENCY_SAMPLES'])
+        self.hedge_percentile = 0.9
+        self.prefilter_stats: Dict[str, int] = defaultdict(int)
+        self.language_state = LanguageState(
+            CONSTANTS['LANGUAGE_STATE_MAX_USERS'],
+            CONSTANTS['LANGUAGE_STATE_MAX_PREFERENCES']
+        )
+        self.scheduler = KeyedScheduler(
+            CONSTANTS['BATCH_WINDOW'],
+            CONSTANTS['MAX_BATCH_SIZE'],
+            CONSTANTS['MAX_LANE_DEPTH'],
+            merge=self._merge_jobs,
+            on_drop=self._discard_job
+        )
+        self.queued_jobs: Set[int] = set()
+        self.in_flight_jobs: Set[int] = set()
+        self.unpersisted_jobs: Set[int] = set()
+        self.translation_cache = TTLCache(CONSTANTS['TRANSLATION_CACHE_SIZE'], CONSTANTS['TRANSLATION_CACHE_TTL'])
+        self.translation_cache_stats: Dict[str, int] = defaultdict(int)
+        self.edit_stats: Dict[str, int] = defaultdict(int)
+        self.segment_stats: Dict[str, int] = defaultdict(int)
+        self.edit_tasks: Dict[int, Task] = {}
         self.worker_tasks: List[Task] = []
+        self.warm_histories: Dict[int, str] = {}
+        self.warm_start: Task | None = None
         self.cleanup_task = None
+        self.recovery_task = None
+        self.flush_task = None
         self._ready = False
 
     async def cog_load(self):
@@ -55,52 +302,288 @@ class TranslationCog(commands.Cog):
     def cog_unload(self):
         if self.cleanup_task:
             self.cleanup_task.cancel()
+        if self.recovery_task:
+            self.recovery_task.cancel()
+        if self.flush_task:
+            self.flush_task.cancel()
+        if len(self.language_state):
+            create_task(self.flush_language_state())
         for task in self.worker_tasks:
             task.cancel()
+        for task in self.edit_tasks.values():
+            task.cancel()
+        self.edit_tasks.clear()
         self.thread_histories.clear()
-        self.language_usage_cache.clear()
-        self.language_usage.clear()
+        self.scheduler.clear()
+        self.queued_jobs.clear()
+        self.in_flight_jobs.clear()
+        self.unpersisted_jobs.clear()
+        self.warm_histories.clear()
         self._ready = False
 
     async def setup_tasks(self):
         if self.cleanup_task:
             self.cleanup_task.cancel()
+        if self.recovery_task:
+            self.recovery_task.cancel()
+        if self.flush_task:
+            self.flush_task.cancel()
         for task in self.worker_tasks:
             task.cancel()
         self.worker_tasks.clear()
+        await asyncio.to_thread(count_tokens, '')
         self.cleanup_task = create_task(self.periodic_cleanup())
+        self.recovery_task = create_task(self.job_recovery_loop())
+        self.flush_task = create_task(self.periodic_language_flush())
         self.worker_tasks.extend(create_task(self.translation_worker()) for _ in range(CONSTANTS['NUM_WORKERS']))
 
     async def periodic_cleanup(self):
         while True:
             try:
-                active_threads = {
-                    thread_id: history 
-                    for thread_id, history in self.thread_histories.items()
-                    if await database.is_thread_active(thread_id)
-                }
-                self.thread_histories = active_threads
-                if len(self.thread_histories) > CONSTANTS['MAX_CACHED_THREADS']:
-                    threads_to_remove = sorted(
-                        self.thread_histories.keys(),
-                        key=lambda x: len(self.thread_histories[x])
-                    )[:len(self.thread_histories) - CONSTANTS['MAX_CACHED_THREADS']]
-                    for thread_id in threads_to_remove:
-                        del self.thread_histories[thread_id]
-                self.language_usage_cache.clear()
-                logging.info(f"Cleanup completed. Active threads: {len(self.thread_histories)}")
+                cached_threads = list(self.thread_histories)
+                active_threads = await database.get_active_threads(cached_threads)
+                for thread_id in cached_threads:
+                    if thread_id not in active_threads:
+                        self.thread_histories.pop(thread_id)
+                await self.save_snapshot()
+                self.translation_cache.expire()
+                pruned_jobs = await database.prune_translation_jobs(CONSTANTS['JOB_RETENTION'])
+                if pruned_jobs:
+                    logging.info(f"Pruned {pruned_jobs} finished translation jobs")
+                pruned = await database.prune_translation_cache(
+                    CONSTANTS['TRANSLATION_CACHE_TTL'],
+                    CONSTANTS['TRANSLATION_CACHE_MAX_BYTES']
+                )
+                requests = self.request_stats['requests']
+                if requests:
+                    logging.info(
+                        f"Translation requests: {requests}, "
+                        f"avg {self.request_stats['prompt_tokens'] / requests:.0f} prompt tokens, "
+                        f"avg {self.request_stats['completion_tokens'] / requests:.0f} completion tokens"
+                    )
+                prefilter = self.prefilter_stats
+                logging.info(
+                    f"Local pre-detection: {prefilter['untranslatable']} untranslatable, "
+                    f"{prefilter['same_language']} already in thread language, {prefilter['model']} sent to model"
+                )
+                stats = self.translation_cache_stats
+                logging.info(
+                    f"Translation cache: {self.translation_cache_hit_ratio():.1%} hit ratio "
+                    f"({stats['memory_hits']} memory, {stats['db_hits']} db, {stats['misses']} misses), "
+                    f"{len(self.translation_cache)} in memory, {pruned} pruned"
+                )
+                lanes = self.scheduler.metrics()
+                if lanes:
+                    busiest = sorted(lanes.items(), key=lambda item: item[1]['depth'], reverse=True)[:5]
+                    logging.info(
+                        f"Translation lanes: {len(lanes)} active, {len(self.scheduler)} queued, "
+                        f"{self.scheduler.totals['dropped']} dropped, {self.scheduler.totals['merged']} merged; busiest: "
+                        + ", ".join(
+                            f"{thread_id} (depth {stats['depth']}, avg wait {stats['avg_wait']:.2f}s, max wait {stats['max_wait']:.2f}s)"
+                            for thread_id, stats in busiest
+                        )
+                    )
+                if self.segment_stats['messages']:
+                    logging.info(
+                        f"Placeholder segmentation: {self.segment_stats['messages']} messages, "
+                        f"{self.segment_stats['spans']} spans held back, "
+                        f"~{self.segment_stats['tokens_saved']} tokens saved "
+                        f"(avg {self.segment_stats['tokens_saved'] / self.segment_stats['messages']:.0f} per message)"
+                    )
+                if self.edit_stats['edits']:
+                    logging.info(
+                        f"Edit retranslations: {self.edit_stats['edits']} edits, "
+                        f"{self.edit_stats['sentences_translated']} sentences translated, "
+                        f"{self.edit_stats['sentences_reused']} reused from cache, "
+                        f"{self.edit_stats['sentences_retried']} retried separately"
+                    )
+                hedge = self.hedge_stats
+                if hedge:
+                    logging.info(
+                        f"Request paths: {hedge['primary']} primary, {hedge['hedge']} hedge, {hedge['fallback']} fallback, "
+                        f"{hedge['skipped']} hedges skipped under backlog; "
+                        f"hedging after {self.hedge_delay():.1f}s (p{self.hedge_percentile * 100:.0f})"
+                    )
+                limiter = ratelimit.get_model_limiter(self.bot)
+                logging.info(
+                    f"Model rate limiter: concurrency {limiter.concurrency:.1f}, {limiter.stats['granted']} granted, "
+                    f"{limiter.stats['throttled']} throttled, {self.request_stats['retries']} translation retries; queue wait "
+                    + ", ".join(
+                        f"{name} {metrics['avg_wait']:.2f}s avg / {metrics['max_wait']:.2f}s max ({metrics['waiting']} waiting)"
+                        for name, metrics in limiter.queue_metrics().items()
+                    )
+                )
+                logging.info(
+                    f"Cleanup completed. Active threads: {len(self.thread_histories)}, "
+                    f"history cache {self.thread_histories.bytes / 1024:.0f} KiB, {self.thread_histories.evictions} evicted"
+                )
             except Exception as e:
                 logging.error(f"Error during cleanup: {e}")
             await sleep(CONSTANTS['CLEANUP_INTERVAL'])
 
+    async def before_shutdown(self):
+        await self.flush_language_state()
+        try:
+            await self.save_snapshot()
+        except Exception as e:
+            logging.error(f"Error saving translation snapshot: {e}")
+
+    async def periodic_language_flush(self):
+        while True:
+            await sleep(CONSTANTS['LANGUAGE_FLUSH_INTERVAL'])
+            await self.flush_language_state()
+
+    async def flush_language_state(self):
+        usage_rows, preference_rows = self.language_state.take_dirty()
+        if not usage_rows and not preference_rows:
+            return
+        try:
+            await database.flush_language_state(usage_rows, preference_rows)
+            logging.debug(f"Flushed {len(usage_rows)} language usage and {len(preference_rows)} preference updates")
+        except Exception as e:
+            logging.error(f"Error flushing language state: {e}")
+            self.language_state.restore_dirty(usage_rows, preference_rows)
+
+    async def save_snapshot(self):
+        threads = {}
+        for thread_id in reversed(list(self.thread_histories)):
+            if len(threads) >= CONSTANTS['SNAPSHOT_MAX_THREADS']:
+                break
+            history = self.thread_histories.peek(thread_id)
+            if history.turns or history.summary:
+                threads[thread_id] = history.to_payload()
+        user_ids = list(self.language_state.usage)[-CONSTANTS['SNAPSHOT_MAX_USERS']:]
+        if threads or user_ids:
+            await database.save_translation_snapshot(threads, user_ids, CONSTANTS['SNAPSHOT_MAX_AGE'])
+            logging.debug(f"Saved translation snapshot: {len(threads)} threads, {len(user_ids)} users")
+
+    async def ensure_warm_start(self):
+        if self.warm_start is None:
+            self.warm_start = create_task(self._load_snapshot())
+        await self.warm_start
+
+    async def _load_snapshot(self):
+        try:
+            threads, user_ids = await database.load_translation_snapshot(CONSTANTS['SNAPSHOT_MAX_AGE'])
+            active_threads = await database.get_active_threads(threads) if threads else set()
+            self.warm_histories = {
+                thread_id: payload
+                for thread_id, payload in threads.items()
+                if thread_id in active_threads and thread_id not in self.thread_histories
+            }
+            missing_users = [user_id for user_id in user_ids if user_id not in self.language_state.usage]
+            if missing_users:
+                usage = await database.get_language_usage_bulk(missing_users)
+                for user_id, counts in usage.items():
+                    self.language_state.load_usage(user_id, counts)
+            logging.info(
+                f"Warm start: {len(self.warm_histories)} thread histories to rehydrate, "
+                f"language usage loaded for {len(missing_users)} users"
+            )
+        except Exception as e:
+            logging.error(f"Error loading translation snapshot: {e}")
+
     async def on_thread_delete(self, thread: disnake.Thread):
+        self.language_state.forget_thread(thread.id)
         await database.clear_thread_data(thread.id)
         self.thread_histories.pop(thread.id, None)
+        self.warm_histories.pop(thread.id, None)
         logging.info(f"Cleaned up data for deleted thread {thread.id}")
 
     def _format_language_name(self, lang: str) -> str:
         return ' '.join(word.capitalize() for word in lang.split())
 
+    def _translation_cache_key(self, content: str, target_langs: Set[str]) -> str | None:
+        normalized = ' '.join(content.casefold().split())
+        if not normalized or len(normalized) > CONSTANTS['TRANSLATION_CACHE_MAX_LENGTH']:
+            return None
+        langs = ','.join(sorted(lang.lower().strip() for lang in target_langs))
+        return hashlib.sha256(f"{langs}\n{normalized}".encode()).hexdigest()
+
+    def translation_cache_hit_ratio(self) -> float:
+        stats = self.translation_cache_stats
+        hits = stats['memory_hits'] + stats['db_hits']
+        lookups = hits + stats['misses']
+        return hits / lookups if lookups else 0.0
+
+    async def _get_cached_translation(self, cache_key: str) -> tuple[str, Dict[str, str]] | None:
+        cached = self.translation_cache.get(cache_key)
+        if cached is not None:
+            self.translation_cache_stats['memory_hits'] += 1
+            return cached
+        try:
+            cached = await database.get_cached_translation(cache_key, CONSTANTS['TRANSLATION_CACHE_TTL'])
+        except Exception as e:
+            logging.error(f"Error reading translation cache: {e}")
+            cached = None
+        if cached is None:
+            self.translation_cache_stats['misses'] += 1
+            return None
+        self.translation_cache_stats['db_hits'] += 1
+        self.translation_cache.set(cache_key, cached)
+        create_task(database.touch_cached_translation(cache_key))
+        return cached
+
+    async def _store_cached_translation(self, cache_key: str, detected_lang: str, translations: Dict[str, str]):
+        self.translation_cache.set(cache_key, (detected_lang, translations))
+        try:
+            await database.store_cached_translation(cache_key, detected_lang, translations)
+        except Exception as e:
+            logging.error(f"Error storing translation cache entry: {e}")
+
+    def _prepare_content(
+        self,
+        content: str,
+        message: Union[disnake.Message, disnake.ModalInteraction]
+    ) -> tuple[str, List[str]]:
+        if content and isinstance(message, disnake.Message) and message.mentions:
+            for mention in message.mentions:
+                content = content.replace(f'<@{mention.id}>', mention.display_name)\
+                               .replace(f'<@!{mention.id}>', mention.display_name)
+        content, spans = segments.segment(content)
+        return content.replace('\n', ' ').strip(), spans
+
+    def _record_segments(self, spans: List[str], target_langs: Set[str], message_id: int | None = None):
+        if not spans:
+            return
+        saved = sum(
+            count_tokens(span) - count_tokens(segments.PLACEHOLDER.format(number))
+            for number, span in enumerate(spans, 1)
+        ) * (1 + len(target_langs))
+        self.segment_stats['messages'] += 1
+        self.segment_stats['spans'] += len(spans)
+        self.segment_stats['tokens_saved'] += max(saved, 0)
+        logging.debug(f"Held back {len(spans)} spans from message {message_id}, saving ~{saved} tokens")
+
+    def _parse_translation_response(self, response: str) -> tuple[str, Dict[str, str]]:
+        lines = response.strip().split('\n')
+        if not lines or not lines[0].startswith('DETECTED:'):
+            raise ValueError("Invalid response format from translation model")
+        detected_lang = lines[0].replace('DETECTED:', '').strip().lower()
+        if not detected_lang:
+            raise ValueError("No detected language in response")
+        translations = {
+            lang.strip().lower(): trans.strip()
+            for line in lines[2:] if ':' in line
+            for lang, trans in [line.split(':', 1)]
+        }
+        return detected_lang, translations
+
+    async def _finalize_translation(
+        self,
+        content: str,
+        detected_lang: str,
+        translations: Dict[str, str],
+        thread_id: int,
+        user_id: int
+    ) -> tuple[str, Dict[str, str]]:
+        await self._update_user_language_preference(user_id, detected_lang, thread_id)
+        return detected_lang, {
+            lang: trans 
+            for lang, trans in translations.items()
+            if lang != detected_lang and trans.strip() != content.strip()
+        }
+
     async def handle_message_translation(
         self, 
         content: str, 
@@ -108,106 +591,424 @@ class TranslationCog(commands.Cog):
         thread_id: int, 
         username: str, 
         user_id: int, 
-        message: Union[disnake.Message, disnake.ModalInteraction]
+        message: Union[disnake.Message, disnake.ModalInteraction],
+        on_partial: Callable[[str], None] | None = None,
+        priority: int = ratelimit.PRIORITY_AUTO
     ) -> tuple[str, Dict[str, str]]:
         try:
-            content = content.replace('\n', ' ').strip()
+            content, spans = self._prepare_content(content, message)
             if not content:
                 return '', {}
-            if isinstance(message, disnake.Message) and message.mentions:
-                for mention in message.mentions:
-                    content = content.replace(f'<@{mention.id}>', mention.display_name)\
-                                   .replace(f'<@!{mention.id}>', mention.display_name)
-            readable_langs = [self._format_language_name(lang) for lang in target_langs]
-            prompt = f"Translate this complete message to {', '.join(readable_langs)}:\n{content}"
-            response = await self._make_openai_request(
-                self._prepare_message(thread_id, prompt, username),
-                thread_id
-            )
-            lines = response.strip().split('\n')
-            if not lines or not lines[0].startswith('DETECTED:'):
-                raise ValueError("Invalid response format from translation model")
-            detected_lang = lines[0].replace('DETECTED:', '').strip().lower()
-            if not detected_lang:
-                raise ValueError("No detected language in response")
-            translations = {
-                lang.strip().lower(): trans.strip()
-                for line in lines[2:] if ':' in line
-                for lang, trans in [line.split(':', 1)]
-            }
-            await asyncio.gather(
-                database.update_language_usage(user_id, detected_lang),
-                self._update_user_language_preference(user_id, detected_lang, thread_id)
-            )
-            if thread_id in self.thread_histories and len(self.thread_histories[thread_id]) > CONSTANTS['MAX_HISTORY']:
-                self.thread_histories[thread_id] = (
-                    [self.thread_histories[thread_id][0]]  # Keep system prompt
-                    + self.thread_histories[thread_id][-(CONSTANTS['MAX_HISTORY']-1):]
+            cache_key = self._translation_cache_key(content, target_langs)
+            cached = await self._get_cached_translation(cache_key) if cache_key else None
+            if cached:
+                detected_lang, translations = cached
+            else:
+                self._record_segments(spans, target_langs, getattr(message, 'id', None))
+                if on_partial and spans:
+                    on_partial = lambda text, render=on_partial: render(segments.restore(text, spans))
+                readable_langs = [self._format_language_name(lang) for lang in target_langs]
+                prompt = f"Translate this complete message to {', '.join(readable_langs)}:\n{content}"
+                response = await self._make_openai_request(
+                    self._prepare_message(thread_id, prompt, username),
+                    thread_id,
+                    on_partial,
+                    priority
                 )
-            return detected_lang, {
-                lang: trans 
-                for lang, trans in translations.items()
-                if lang != detected_lang and trans.strip() != content.strip()
-            }
+                detected_lang, translations = self._parse_translation_response(response)
+                if cache_key:
+                    await self._store_cached_translation(cache_key, detected_lang, translations)
+            detected_lang, translations = await self._finalize_translation(content, detected_lang, translations, thread_id, user_id)
+            return detected_lang, segments.restore_all(translations, spans)
         except Exception as e:
             logging.error(f"Translation error: {e}")
             self.thread_histories.pop(thread_id, None)
             raise
 
-    async def _make_openai_request(self, messages: List[dict], thread_id: int) -> str:
+    async def handle_batch_translation(self, jobs: List[tuple]) -> List[tuple[str, Dict[str, str]]]:
+        thread_id = jobs[0][3]
+        target_langs = set().union(*(job[2] for job in jobs))
+        prepared = [self._prepare_content(job[1], job[0]) for job in jobs]
+        contents = [content for content, _ in prepared]
+        resolved: Dict[int, tuple[str, Dict[str, str]]] = {}
+        finalized: Dict[int, tuple[str, Dict[str, str]]] = {}
+        pending = []
+        for index, content in enumerate(contents):
+            if not content:
+                continue
+            cache_key = self._translation_cache_key(content, target_langs)
+            cached = await self._get_cached_translation(cache_key) if cache_key else None
+            if cached:
+                resolved[index] = cached
+            else:
+                pending.append((index, cache_key))
+        if len(pending) == 1:
+            index, _ = pending[0]
+            message, content, _, _, username, user_id = jobs[index]
+            finalized[index] = await self.handle_message_translation(content, target_langs, thread_id, username, user_id, message)
+            pending = []
+        if pending:
+            for index, _ in pending:
+                self._record_segments(prepared[index][1], target_langs, jobs[index][0].id)
+            blocks = await self._numbered_translation_request(
+                [f"{jobs[index][4]}: {contents[index]}" for index, _ in pending],
+                target_langs,
+                thread_id
+            )
+            for number, (index, cache_key) in enumerate(pending, 1):
+                try:
+                    detected_lang, translations = self._parse_translation_response(blocks.get(number, ''))
+                except ValueError:
+                    logging.warning(f"Batch response missing block {number} in thread {thread_id}, translating separately")
+                    message, content, _, _, username, user_id = jobs[index]
+                    finalized[index] = await self.handle_message_translation(content, target_langs, thread_id, username, user_id, message)
+                    continue
+                if cache_key:
+                    await self._store_cached_translation(cache_key, detected_lang, translations)
+                resolved[index] = (detected_lang, translations)
+        results = []
+        for index, content in enumerate(contents):
+            if index in finalized:
+                results.append(finalized[index])
+            elif index in resolved:
+                detected_lang, translations = resolved[index]
+                detected_lang, translations = await self._finalize_translation(content, detected_lang, translations, thread_id, jobs[index][5])
+                results.append((detected_lang, segments.restore_all(translations, prepared[index][1])))
+            else:
+                results.append(('', {}))
+        return results
+
+    async def _numbered_translation_request(
+        self,
+        texts: List[str],
+        target_langs: Set[str],
+        thread_id: int,
+        noun: str = 'messages',
+        record_history: bool = True
+    ) -> Dict[int, str]:
+        readable_langs = [self._format_language_name(lang) for lang in target_langs]
+        numbered = '\n'.join(f"[{number}] {text}" for number, text in enumerate(texts, 1))
+        prompt = (
+            f"Translate each of these {len(texts)} {noun} to {', '.join(readable_langs)}. "
+            "Translate every one of them independently and answer with one block each, "
+            "starting each block with its number on its own line, e.g.:\n"
+            "[1]\nDETECTED:<language_name>\nTRANSLATIONS:\n<language_name>:translated_text\n\n"
+            f"{numbered}"
+        )
         try:
-            response = openai_client.chat.completions.create(
-                model=CONSTANTS['MODEL_NAME'],
-                messages=messages,
-                temperature=0,
+            response = await self._make_openai_request(
+                self._prepare_message(thread_id, prompt), thread_id, record_history=record_history
+            )
+        except Exception:
+            self.thread_histories.pop(thread_id, None)
+            raise
+        parts = BATCH_BLOCK_MARKER.split(response.strip())
+        return {int(number): block for number, block in zip(parts[1::2], parts[2::2])}
+
+    async def _translate_edit(
+        self,
+        sentences: List[str],
+        changed: Set[int],
+        target_langs: Set[str],
+        thread_id: int
+    ) -> tuple[str, Dict[str, str]]:
+        """Translate only changed sentences and those without a stored translation, caching each one"""
+        results: List[tuple[str, Dict[str, str]] | None] = [None] * len(sentences)
+        pending = []
+        for index, sentence in enumerate(sentences):
+            cache_key = self._translation_cache_key(sentence, target_langs)
+            cached = await self._get_cached_translation(cache_key) if cache_key and index not in changed else None
+            if cached:
+                results[index] = cached
+            else:
+                pending.append((index, cache_key))
+        self.edit_stats['sentences_reused'] += len(sentences) - len(pending)
+        self.edit_stats['sentences_translated'] += len(pending)
+        if len(pending) == 1:
+            index, _ = pending[0]
+            results[index] = await self._translate_standalone(sentences[index], target_langs, thread_id)
+        elif pending:
+            blocks = await self._numbered_translation_request(
+                [sentences[index] for index, _ in pending], target_langs, thread_id, 'sentences', record_history=False
             )
-            result = response.choices[0].message.content.strip()
-            if thread_id in self.thread_histories:
-                self.thread_histories[thread_id].append({
-                    "role": "assistant", 
-                    "content": result
-                })
+            for number, (index, cache_key) in enumerate(pending, 1):
+                try:
+                    detected_lang, translations = self._parse_translation_response(blocks.get(number, ''))
+                except ValueError:
+                    logging.warning(f"Edit response missing sentence {number} in thread {thread_id}, translating separately")
+                    self.edit_stats['sentences_retried'] += 1
+                    results[index] = await self._translate_standalone(sentences[index], target_langs, thread_id)
+                    continue
+                if cache_key:
+                    await self._store_cached_translation(cache_key, detected_lang, translations)
+                results[index] = (detected_lang, translations)
+        detected_lang = Counter(detected for detected, _ in results).most_common(1)[0][0]
+        translations = {
+            lang.lower(): ' '.join(
+                sentence_translations.get(lang.lower()) or sentence
+                for sentence, (_, sentence_translations) in zip(sentences, results)
+            )
+            for lang in target_langs
+        }
+        return detected_lang, translations
+
+    async def _translate_standalone(self, text: str, target_langs: Set[str], thread_id: int) -> tuple[str, Dict[str, str]]:
+        cache_key = self._translation_cache_key(text, target_langs)
+        cached = await self._get_cached_translation(cache_key) if cache_key else None
+        if cached:
+            return cached
+        readable_langs = [self._format_language_name(lang) for lang in target_langs]
+        prompt = f"Translate this complete message to {', '.join(readable_langs)}:\n{text}"
+        response = await self._make_openai_request(self._prepare_message(thread_id, prompt), thread_id, record_history=False)
+        detected_lang, translations = self._parse_translation_response(response)
+        if cache_key:
+            await self._store_cached_translation(cache_key, detected_lang, translations)
+        return detected_lang, translations
+
+    async def _make_openai_request(
+        self,
+        messages: List[dict],
+        thread_id: int,
+        on_partial: Callable[[str], None] | None = None,
+        priority: int = ratelimit.PRIORITY_AUTO,
+        record_history: bool = True
+    ) -> str:
+        try:
+            estimate = sum(count_tokens(message["content"]) for message in messages) + count_tokens(messages[-1]["content"]) * 2
+            for attempt in range(CONSTANTS['MAX_RETRIES'] + 1):
+                try:
+                    if on_partial:
+                        result, usage = await self._deadline_completion(messages, estimate, on_partial, priority)
+                    else:
+                        result, usage = await self._hedged_completion(messages, estimate, priority)
+                    break
+                except ratelimit.RETRYABLE_ERRORS as e:
+                    if attempt == CONSTANTS['MAX_RETRIES']:
+                        raise
+                    delay = ratelimit.backoff_delay(attempt, ratelimit.retry_after(e))
+                    self.request_stats['retries'] += 1
+                    logging.warning(f"Translation request for thread {thread_id} failed ({e}), retrying in {delay:.1f}s")
+                    await sleep(delay)
+            prompt_tokens = usage.prompt_tokens if usage else 0
+            self.request_stats['requests'] += 1
+            self.request_stats['prompt_tokens'] += prompt_tokens
+            self.request_stats['completion_tokens'] += usage.completion_tokens if usage else 0
+            logging.debug(f"Translation request for thread {thread_id} used {prompt_tokens} prompt tokens")
+            history = self.thread_histories.get(thread_id) if record_history else None
+            if history is not None:
+                history.last_prompt_tokens = prompt_tokens
+                history.append("user", messages[-1]["content"])
+                history.append("assistant", result)
+                if history.trim(CONSTANTS['HISTORY_TOKEN_BUDGET']) and not history.summarizing:
+                    create_task(self._summarize_history(thread_id, history))
+                self.thread_histories.resize(thread_id)
             return result
         except Exception as e:
             logging.error(f"OpenAI API error: {e}")
             raise
 
+    async def _completion(
+        self,
+        model: str,
+        messages: List[dict],
+        estimate: int,
+        on_partial: Callable[[str], None] | None = None,
+        priority: int = ratelimit.PRIORITY_AUTO,
+        granted: asyncio.Event | None = None
+    ) -> tuple[str, object]:
+        async with ratelimit.get_model_limiter(self.bot).limit(estimate, priority) as lease:
+            if granted:
+                granted.set()
+            if on_partial:
+                result, usage = await self._stream_completion(model, messages, on_partial)
+            else:
+                response = await openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0,
+                    timeout=CONSTANTS['REQUEST_TIMEOUT'],
+                )
+                result, usage = response.choices[0].message.content.strip(), response.usage
+            if usage:
+                lease.tokens = usage.total_tokens
+        return result, usage
+
+    async def _stream_completion(self, model: str, messages: List[dict], on_partial: Callable[[str], None]) -> tuple[str, object]:
+        stream = await openai_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            timeout=CONSTANTS['REQUEST_TIMEOUT'],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        text = ''
+        usage = None
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                text += chunk.choices[0].delta.content
+                on_partial(text)
+        return text.strip(), usage
+
+    def hedge_delay(self) -> float:
+        if len(self.latency_samples) < CONSTANTS['HEDGE_MIN_SAMPLES']:
+            return CONSTANTS['HEDGE_DEFAULT_DELAY']
+        ordered = sorted(self.latency_samples)
+        delay = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))]
+        return max(CONSTANTS['HEDGE_MIN_DELAY'], min(delay, CONSTANTS['REQUEST_DEADLINE']))
+
+    def _record_request_path(self, path: str, latency: float, hedged: bool = False):
+        self.hedge_stats[path] += 1
+        if path != 'fallback':
+            self.latency_samples.append(latency)
+        if hedged:
+            if path == 'hedge':
+                self.hedge_percentile = max(0.75, self.hedge_percentile - 0.01)
+            else:
+                self.hedge_percentile = min(0.99, self.hedge_percentile + 0.01)
+
+    async def _wait_for_grant(self, tasks, granted: asyncio.Event) -> set:
+        waiter = create_task(granted.wait())
+        try:
+            done, _ = await asyncio.wait([*tasks, waiter], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        return done - {waiter}
+
+    async def _hedged_completion(self, messages: List[dict], estimate: int, priority: int) -> tuple[str, object]:
+        granted = asyncio.Event()
+        tasks = {
+            create_task(self._completion(CONSTANTS['MODEL_NAME'], messages, estimate, priority=priority, granted=granted)): 'primary'
+        }
+        hedged = False
+        error = None
+        try:
+            done = await self._wait_for_grant(tasks, granted)
+            started = time.monotonic()
+            deadline = started + CONSTANTS['REQUEST_DEADLINE']
+            hedge_at = started + self.hedge_delay()
+            while True:
+                for task in done:
+                    path = tasks.pop(task)
+                    if task.exception() is None:
+                        self._record_request_path(path, time.monotonic() - started, hedged)
+                        return task.result()
+                    error = error or task.exception()
+                if not tasks:
+                    raise error
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if ratelimit.get_model_limiter(self.bot).waiting:
+                        self.hedge_stats['skipped'] += 1
+                    else:
+                        tasks[create_task(self._completion(CONSTANTS['MODEL_NAME'], messages, estimate, priority=priority))] = 'hedge'
+                        hedged = True
+                wake = deadline if hedge_at is None else min(hedge_at, deadline)
+                done, _ = await asyncio.wait(tasks, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return await self._fallback_completion(messages, estimate, priority)
+
+    async def _deadline_completion(
+        self,
+        messages: List[dict],
+        estimate: int,
+        on_partial: Callable[[str], None],
+        priority: int
+    ) -> tuple[str, object]:
+        granted = asyncio.Event()
+        task = create_task(self._completion(CONSTANTS['MODEL_NAME'], messages, estimate, on_partial, priority, granted))
+        try:
+            await self._wait_for_grant([task], granted)
+            started = time.monotonic()
+            result = await asyncio.wait_for(task, CONSTANTS['REQUEST_DEADLINE'])
+        except asyncio.TimeoutError:
+            return await self._fallback_completion(messages, estimate, priority)
+        finally:
+            task.cancel()
+        self._record_request_path('primary', time.monotonic() - started)
+        return result
+
+    async def _fallback_completion(self, messages: List[dict], estimate: int, priority: int) -> tuple[str, object]:
+        logging.warning(
+            f"No translation within {CONSTANTS['REQUEST_DEADLINE']}s, "
+            f"falling back to {CONSTANTS['FALLBACK_MODEL_NAME']}"
+        )
+        result = await self._completion(CONSTANTS['FALLBACK_MODEL_NAME'], messages, estimate, priority=priority)
+        self._record_request_path('fallback', 0.0)
+        return result
+
+    async def _summarize_history(self, thread_id: int, history: ThreadHistory):
+        history.summarizing = True
+        try:
+            while history.evicted:
+                evicted, history.evicted = history.evicted, []
+                transcript = '\n'.join(f"{role}: {content}" for role, content in evicted)
+                estimate = count_tokens(transcript) + count_tokens(history.summary or '') + CONSTANTS['SUMMARY_MAX_TOKENS']
+                async with ratelimit.get_model_limiter(self.bot).limit(estimate, ratelimit.PRIORITY_AUTO):
+                    response = await openai_client.chat.completions.create(
+                        model=CONSTANTS['MODEL_NAME'],
+                        messages=[
+                            {"role": "system", "content": SUMMARY_PROMPT},
+                            {"role": "user", "content": f"Existing summary:\n{history.summary or '(none)'}\n\nNew turns:\n{transcript}"}
+                        ],
+                        temperature=0,
+                        max_tokens=CONSTANTS['SUMMARY_MAX_TOKENS'],
+                        timeout=CONSTANTS['REQUEST_TIMEOUT'],
+                    )
+                history.summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            logging.error(f"Error summarizing history for thread {thread_id}: {e}")
+            history.evicted.clear()
+        finally:
+            history.summarizing = False
+            if self.thread_histories.peek(thread_id) is history:
+                self.thread_histories.resize(thread_id)
+
     async def _update_user_language_preference(self, user_id: int, detected_lang: str, thread_id: int):
         try:
-            if user_id not in self.language_usage:
+            if user_id not in self.language_state.usage:
                 await self.load_language_usage(user_id)
-            detected_lang = detected_lang.lower().strip()
-            self.language_usage[user_id][detected_lang] += 1
-            total_messages = sum(self.language_usage[user_id].values())
-            if total_messages >= CONSTANTS['USAGE_THRESHOLD']:
-                usage_percentages = {
-                    lang: (count / total_messages) * 100 
-                    for lang, count in self.language_usage[user_id].items()
-                }
-                preferred_lang = max(usage_percentages.items(), key=lambda x: x[1])[0]
-                if usage_percentages[preferred_lang] > CONSTANTS['PREFERRED_LANG_THRESHOLD']:
-                    current_user_lang = await database.get_user_language(thread_id, user_id)
-                    if current_user_lang != preferred_lang:
-                        await self.handle_new_user_language(thread_id, user_id, preferred_lang)
+            usage = self.language_state.record_usage(user_id, detected_lang.lower().strip())
+            preferred_lang = usage.preferred(CONSTANTS['USAGE_THRESHOLD'], CONSTANTS['PREFERRED_LANG_THRESHOLD'])
+            if preferred_lang and await self.get_user_language(thread_id, user_id) != preferred_lang:
+                await self.handle_new_user_language(thread_id, user_id, preferred_lang)
         except Exception as e:
             logging.error(f"Error updating language preference: {e}")
 
+    async def get_user_language(self, thread_id: int, user_id: int) -> str | None:
+        if not self.language_state.has_preference(thread_id, user_id):
+            language = await database.get_user_language(thread_id, user_id)
+            self.language_state.load_preference(thread_id, user_id, language)
+        return self.language_state.get_preference(thread_id, user_id)
+
     async def handle_new_user_language(self, thread_id: int, user_id: int, lang_code: str) -> None:
-        await asyncio.gather(
-            database.set_user_language(thread_id, user_id, lang_code),
-            database.add_thread_language(thread_id, lang_code)
-        )
+        self.language_state.set_preference(thread_id, user_id, lang_code)
+        if lang_code not in await database.get_thread_languages(thread_id):
+            await database.add_thread_language(thread_id, lang_code)
 
-    def _prepare_message(self, thread_id: int, content: str, username: str) -> List[dict]:
-        messages = self.get_thread_history(thread_id).copy()
-        messages.append({"role": "user", "content": f"{username}: {content}"})
+    def _prepare_message(self, thread_id: int, content: str, username: str = None) -> List[dict]:
+        messages = self.get_thread_history(thread_id).messages()
+        messages.append({"role": "user", "content": f"{username}: {content}" if username else content})
         return messages
 
-    def get_thread_history(self, thread_id: int) -> List[dict]:
-        return self.thread_histories.setdefault(
-            thread_id, 
-            [{"role": "system", "content": COMBINED_PROMPT}]
-        )
+    def get_thread_history(self, thread_id: int) -> ThreadHistory:
+        history = self.thread_histories.get(thread_id)
+        if history is None:
+            payload = self.warm_histories.pop(thread_id, None)
+            try:
+                history = ThreadHistory.from_payload(payload) if payload else ThreadHistory()
+            except (ValueError, TypeError) as e:
+                logging.error(f"Discarding unreadable history snapshot for thread {thread_id}: {e}")
+                history = ThreadHistory()
+            self.thread_histories.set(thread_id, history)
+        return history
 
     def create_translation_embed(
         self, 
@@ -217,7 +1018,7 @@ class TranslationCog(commands.Cog):
         auto: bool = True
     ) -> Embed:
         embed = Embed(
-            title="🌐 Auto-Translations" if auto else "🌐 Translation", 
+            title=AUTO_TRANSLATION_TITLE if auto else "🌐 Translation", 
             color=Color.blue()
         )
         if not auto:
@@ -244,45 +1045,203 @@ class TranslationCog(commands.Cog):
         )
         return embed
 
+    async def _should_translate(self, job: tuple) -> bool:
+        message, content, _, thread_id, _, _ = job
+        return bool(content.strip()) and not message.channel.locked and await database.is_thread_active(thread_id)
+
+    async def _send_translation(
+        self,
+        message: disnake.Message,
+        content: str,
+        translations: Dict[str, str]
+    ) -> disnake.Message | None:
+        if not translations:
+            return None
+        embed = self.create_translation_embed(message, content, translations)
+        try:
+            return await message.reply(embed=embed, mention_author=False)
+        except disnake.HTTPException as e:
+            logging.error(f"Failed to send translation: {e}")
+            return None
+
+    async def _translate_single(self, job: tuple) -> disnake.Message | None:
+        message, content, target_langs, thread_id, username, user_id = job
+        if not CONSTANTS['STREAM_TRANSLATIONS']:
+            _, translations = await self.handle_message_translation(
+                content, target_langs, thread_id, username, user_id, message
+            )
+            return await self._send_translation(message, content, translations)
+        stream = StreamingReply(self, message, content)
+        try:
+            _, translations = await self.handle_message_translation(
+                content, target_langs, thread_id, username, user_id, message, stream.update
+            )
+        except Exception:
+            await stream.abort()
+            raise
+        return await stream.finish(translations)
+
+    async def _lease_jobs(self, batch: List[tuple]) -> List[tuple]:
+        message_ids = [job[0].id for job in batch]
+        self.queued_jobs.difference_update(message_ids)
+        self.in_flight_jobs.update(message_ids)
+        try:
+            leased = await database.lease_translation_jobs(
+                message_ids, CONSTANTS['JOB_VISIBILITY_TIMEOUT'], CONSTANTS['MAX_JOB_ATTEMPTS']
+            )
+        except Exception as e:
+            logging.error(f"Error leasing translation jobs, processing without a lease: {e}")
+            return batch
+        leased |= self.unpersisted_jobs.intersection(message_ids)
+        self.unpersisted_jobs.difference_update(message_ids)
+        jobs, skipped = [], []
+        for job in batch:
+            if job[0].id not in leased:
+                continue
+            (jobs if await self._should_translate(job) else skipped).append(job)
+        if skipped:
+            await database.finish_translation_jobs([job[0].id for job in skipped], 'dropped')
+        return jobs
+
+    async def _process_jobs(self, jobs: List[tuple]):
+        pending = {job[0].id for job in jobs}
+        try:
+            if len(jobs) == 1:
+                reply = await self._translate_single(jobs[0])
+                pending.clear()
+                await database.complete_translation_job(jobs[0][0].id, reply.id if reply else None)
+            elif jobs:
+                results = await self.handle_batch_translation(jobs)
+                for job, (_, translations) in zip(jobs, results):
+                    reply = await self._send_translation(job[0], job[1], translations)
+                    pending.discard(job[0].id)
+                    await database.complete_translation_job(job[0].id, reply.id if reply else None)
+        except Exception as e:
+            if pending:
+                await database.release_translation_jobs(
+                    list(pending), str(e), CONSTANTS['MAX_JOB_ATTEMPTS'], CONSTANTS['JOB_RETRY_DELAY']
+                )
+            raise
+
     async def translation_worker(self):
         while True:
             try:
-                job = await self.translation_queue.get()
+                thread_id, batch = await self.scheduler.get()
                 try:
-                    message, content, target_langs, thread_id, username, user_id = job
-                    if message.channel.locked or not await database.is_thread_active(thread_id):
-                        continue
-                    if not content.strip():
-                        continue
-                    _, translations = await self.handle_message_translation(
-                        content, target_langs, thread_id, username, user_id, message
-                    )
-                    if translations:
-                        embed = self.create_translation_embed(message, content, translations)
-                        try:
-                            await message.reply(embed=embed, mention_author=False)
-                        except disnake.HTTPException as e:
-                            logging.error(f"Failed to send translation: {e}")
+                    await self._process_jobs(await self._lease_jobs(batch))
                 except Exception as e:
                     worker_id = id(asyncio.current_task())
                     logging.error(f"Error in worker {worker_id}: {e}")
                 finally:
-                    self.translation_queue.task_done()
+                    self.in_flight_jobs.difference_update(job[0].id for job in batch)
+                    self.scheduler.release(thread_id)
             except Exception as e:
                 worker_id = id(asyncio.current_task())
                 logging.error(f"Translation worker {worker_id} critical error: {e}")
                 await sleep(1)
 
+    def _merge_jobs(self, older: tuple, newer: tuple) -> tuple | None:
+        if older[5] != newer[5]:
+            return None
+        self.queued_jobs.discard(older[0].id)
+        self.unpersisted_jobs.discard(older[0].id)
+        merged = (newer[0], f"{older[1]}\n{newer[1]}", older[2] | newer[2], newer[3], newer[4], newer[5])
+        create_task(self._persist_merge(older[0].id, merged))
+        return merged
+
+    async def _persist_merge(self, dropped_id: int, job: tuple):
+        message, content, target_langs, thread_id, username, user_id = job
+        try:
+            await database.merge_translation_jobs(
+                dropped_id, message.id, thread_id, user_id, username, content, target_langs
+            )
+        except Exception as e:
+            logging.error(f"Error persisting merged translation job {message.id}: {e}")
+            return
+        self.unpersisted_jobs.discard(message.id)
+
+    def _discard_job(self, job: tuple):
+        self.queued_jobs.discard(job[0].id)
+        create_task(database.finish_translation_jobs([job[0].id], 'dropped'))
+
+    async def enqueue_translation(self, job: tuple):
+        message, content, target_langs, thread_id, username, user_id = job
+        try:
+            await database.enqueue_translation_job(message.id, thread_id, user_id, username, content, target_langs)
+        except Exception as e:
+            logging.error(f"Error persisting translation job {message.id}, processing it without a lease: {e}")
+            self.unpersisted_jobs.add(message.id)
+        self.queued_jobs.add(message.id)
+        self.scheduler.put(thread_id, job)
+
+    async def job_recovery_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                recovered = await self.recover_jobs()
+                if recovered:
+                    logging.info(f"Recovered {recovered} pending translation jobs")
+            except Exception as e:
+                logging.error(f"Error recovering translation jobs: {e}")
+            await sleep(CONSTANTS['JOB_RECOVERY_INTERVAL'])
+
+    async def recover_jobs(self) -> int:
+        rows = await database.fetch_recoverable_translation_jobs(
+            CONSTANTS['MAX_JOB_ATTEMPTS'], CONSTANTS['JOB_MAX_AGE'], CONSTANTS['JOB_RECOVERY_BATCH']
+        )
+        recovered = 0
+        for message_id, channel_id, user_id, username, content, target_langs, attempts in rows:
+            if message_id in self.queued_jobs or message_id in self.in_flight_jobs:
+                continue
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                await database.finish_translation_jobs([message_id], 'dropped')
+                continue
+            try:
+                message = await fetch_message(self.bot, channel, message_id)
+            except disnake.NotFound:
+                await database.finish_translation_jobs([message_id], 'dropped')
+                continue
+            except disnake.HTTPException as e:
+                logging.error(f"Error fetching message {message_id} for translation recovery: {e}")
+                continue
+            if attempts and (reply := await self._find_existing_reply(message)):
+                await database.complete_translation_job(message_id, reply.id)
+                continue
+            await self.enqueue_translation((message, content, set(json.loads(target_langs)), channel_id, username, user_id))
+            recovered += 1
+        return recovered
+
+    async def _find_existing_reply(self, message: disnake.Message) -> disnake.Message | None:
+        try:
+            async for reply in message.channel.history(after=message, limit=25):
+                if (reply.author.id == self.bot.user.id and reply.reference
+                        and reply.reference.message_id == message.id
+                        and reply.embeds and reply.embeds[0].title == AUTO_TRANSLATION_TITLE):
+                    return reply
+        except disnake.HTTPException as e:
+            logging.error(f"Error searching for an existing translation of {message.id}: {e}")
+        return None
+
     @commands.Cog.listener()
     async def on_message(self, message: disnake.Message):
         if (message.author.bot or 
             not isinstance(message.channel, disnake.Thread) or
             not await database.is_thread_active(message.channel.id)):
             return
+        await self.ensure_warm_start()
         thread_languages = await database.get_thread_languages(message.channel.id)
         if not thread_languages:
             return
-        await self.translation_queue.put((
+        if not langdetect.has_translatable_text(message.content):
+            self.prefilter_stats['untranslatable'] += 1
+            return
+        detected_lang = langdetect.detect_language(message.content)
+        if detected_lang and set(thread_languages) <= {detected_lang}:
+            self.prefilter_stats['same_language'] += 1
+            return
+        self.prefilter_stats['model'] += 1
+        await self.enqueue_translation((
             message, 
             message.content, 
             set(thread_languages), 
@@ -291,6 +1250,63 @@ class TranslationCog(commands.Cog):
             message.author.id
         ))
 
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: disnake.RawMessageUpdateEvent):
+        content = payload.data.get('content')
+        if content is None or payload.data.get('author', {}).get('bot'):
+            return
+        if not await database.is_thread_active(payload.channel_id):
+            return
+        if task := self.edit_tasks.pop(payload.message_id, None):
+            task.cancel()
+        self.edit_tasks[payload.message_id] = create_task(self._retranslate_edit(payload, content))
+
+    async def _retranslate_edit(self, payload: disnake.RawMessageUpdateEvent, content: str):
+        try:
+            await sleep(CONSTANTS['EDIT_DEBOUNCE'])
+            job = await database.get_translation_job(payload.message_id)
+            if job is None or job[2] is None:
+                return
+            old_content, target_langs, reply_id = job
+            channel = self.bot.get_channel(payload.channel_id)
+            if channel is None or channel.locked:
+                return
+            message = payload.cached_message or await fetch_message(self.bot, channel, payload.message_id)
+            new_text, spans = self._prepare_content(content, message)
+            new_sentences = split_sentences(new_text)
+            old_sentences = split_sentences(self._prepare_content(old_content, message)[0])
+            changed = {
+                index
+                for tag, _, _, new_start, new_end in SequenceMatcher(None, old_sentences, new_sentences, autojunk=False).get_opcodes()
+                if tag != 'equal'
+                for index in range(new_start, new_end)
+            }
+            if not changed or not new_sentences:
+                return
+            self.edit_stats['edits'] += 1
+            detected_lang, translations = await self._translate_edit(new_sentences, changed, target_langs, payload.channel_id)
+            translations = segments.restore_all({
+                lang: trans
+                for lang, trans in translations.items()
+                if lang != detected_lang and trans.strip() != new_text.strip()
+            }, spans)
+            reply = channel.get_partial_message(reply_id)
+            if translations:
+                await reply.edit(embed=self.create_translation_embed(message, new_text, translations))
+            else:
+                await reply.delete()
+            await database.update_translation_job_content(payload.message_id, content)
+            logging.debug(f"Retranslated edit of {payload.message_id}: {len(changed)} of {len(new_sentences)} sentences changed")
+        except asyncio.CancelledError:
+            raise
+        except disnake.NotFound:
+            pass
+        except Exception as e:
+            logging.error(f"Error retranslating edited message {payload.message_id}: {e}")
+        finally:
+            if self.edit_tasks.get(payload.message_id) is asyncio.current_task():
+                del self.edit_tasks[payload.message_id]
+
     @commands.slash_command(name="translate", description="Translation management commands")
     async def translate_group(self, inter: disnake.ApplicationCommandInteraction):
         pass
@@ -324,6 +1340,7 @@ class TranslationCog(commands.Cog):
         if inter.custom_id != "translate_modal":
             return
         await inter.response.defer()
+        await self.ensure_warm_start()
         text_to_translate = inter.text_values["text_to_translate"]
         target_lang = inter.text_values["target_language"]
         _, translations = await self.handle_message_translation(
@@ -332,7 +1349,8 @@ class TranslationCog(commands.Cog):
             inter.channel.id if isinstance(inter.channel, disnake.Thread) else 0,
             inter.author.display_name,
             inter.author.id,
-            inter
+            inter,
+            priority=ratelimit.PRIORITY_INTERACTIVE
         )
         embed = self.create_translation_embed(inter, text_to_translate, translations, auto=False)
         await inter.edit_original_response(embed=embed)
@@ -370,7 +1388,7 @@ class TranslationCog(commands.Cog):
                 await self._send_embed_response(inter, "❌ Already Active", "Auto-translation is already enabled in this thread!", Color.red())
                 return
             await database.set_thread_active(thread_id, True)
-            self.thread_histories[thread_id] = [{"role": "system", "content": COMBINED_PROMPT}]
+            self.thread_histories.set(thread_id, ThreadHistory())
             description = (
                 "Auto-translation has been enabled for this thread!\n\n"
                 "**How it works**\n"
@@ -392,6 +1410,7 @@ class TranslationCog(commands.Cog):
                 return
             await database.set_thread_active(thread_id, False)
             self.thread_histories.pop(thread_id, None)
+            self.warm_histories.pop(thread_id, None)
             await self._send_embed_response( inter, "🌐 Translation Disabled", "Auto-translation has been disabled for this thread.", Color.orange(), ephemeral=False)
         except Exception as e:
             logging.error(f"Failed to disable translation in thread {thread_id}: {e}")
@@ -416,19 +1435,34 @@ class TranslationCog(commands.Cog):
                     value=", ".join(formatted_langs),
                     inline=False
                 )
+            history = self.thread_histories.peek(inter.channel.id)
+            if history is not None:
+                embed.add_field(
+                    name="Context",
+                    value=(
+                        f"{history.tokens:,} tokens in {len(history)} turns{' plus summary' if history.summary else ''}\n"
+                        f"Last request: {history.last_prompt_tokens:,} prompt tokens"
+                    ),
+                    inline=False
+                )
+            lane = self.scheduler.lane_metrics(inter.channel.id)
+            if lane is not None:
+                embed.add_field(
+                    name="Queue",
+                    value=f"{lane['depth']} waiting, oldest {lane['oldest_wait']:.1f}s, avg wait {lane['avg_wait']:.1f}s",
+                    inline=False
+                )
         await inter.response.send_message(embed=embed, ephemeral=True)
 
     async def language_usage_stats(self, inter: disnake.ApplicationCommandInteraction):
         user_id = inter.author.id
-        if user_id not in self.language_usage:
-            await self.load_language_usage(user_id)
-        if not self.language_usage[user_id]:
+        usage = self.language_state.get_usage(user_id) or await self.load_language_usage(user_id)
+        if not usage:
             await self._send_embed_response(inter, "📊 Language Usage Statistics", "No language usage data available yet.", Color.blue())
             return
-        total_messages = sum(self.language_usage[user_id].values())
         usage_stats = [
-            f"{self._format_language_name(lang)}: {(count / total_messages) * 100:.1f}% ({count} messages)"
-            for lang, count in self.language_usage[user_id].items()
+            f"{self._format_language_name(lang)}: {(count / usage.total) * 100:.1f}% ({count} messages)"
+            for lang, count in usage.counts.items()
         ]
         embed = Embed(
             title="📊 Language Usage Statistics",
@@ -439,8 +1473,8 @@ class TranslationCog(commands.Cog):
 
     async def reset_usage_stats(self, inter: disnake.ApplicationCommandInteraction):
         user_id = inter.author.id
+        self.language_state.reset_user(user_id)
         await database.clear_language_usage(user_id)
-        self.language_usage.pop(user_id, None)
         await self._send_embed_response(inter, "📊 Statistics Reset", "Your language usage statistics have been reset.", Color.green())
 
     async def _send_embed_response(
@@ -454,13 +1488,13 @@ class TranslationCog(commands.Cog):
         embed = Embed(title=title, description=description, color=color)
         await inter.response.send_message(embed=embed, ephemeral=ephemeral)
 
-    async def load_language_usage(self, user_id: int):
+    async def load_language_usage(self, user_id: int) -> UserLanguageUsage:
         try:
             usage_data = await database.get_language_usage(user_id)
-            self.language_usage[user_id] = defaultdict(int, usage_data)
         except Exception as e:
             logging.error(f"Error loading language usage for user {user_id}: {e}")
-            self.language_usage[user_id] = defaultdict(int)
+            usage_data = {}
+        return self.language_state.load_usage(user_id, usage_data)
 
 def setup(bot):
     bot.add_cog(TranslationCog(bot))
\ No newline at end of file
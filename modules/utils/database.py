@@ -1,96 +1,403 @@
 # modules.utils.database
 
+from modules.utils.cache import TTLCache
+from contextlib import asynccontextmanager
 from disnake.ext import commands
 from core import config
-from typing import Dict
+from typing import Dict, List
 import aiosqlite
 import disnake
 import asyncio
 import logging
+import json
 import time
 
 DATABASE_FILE = config.read().get('DATABASE_FILE')
 
-_connection_pool = []
 MAX_POOL_SIZE = 5
+POOL_ACQUIRE_TIMEOUT = 30
+WRITE_BATCH_WINDOW = 0.005
+WRITE_BATCH_MAX = 200
+THREAD_CACHE_SIZE = 4096
+THREAD_CACHE_TTL = 600
+ACTIVE_QUERY_CHUNK = 500
+REPLY_CACHE_SIZE = 1024
+REPLY_CACHE_TTL = 3600
+POINTS_REPLY_RETENTION = 90 * 24 * 60 * 60
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA mmap_size=268435456',
+)
+READ_PRAGMAS = CONNECTION_PRAGMAS + ('PRAGMA query_only=ON',)
+WRITE_PRAGMAS = ('PRAGMA journal_mode=WAL',) + CONNECTION_PRAGMAS
 
-async def get_connection():
-    if _connection_pool:
-        return _connection_pool.pop()
-    return await aiosqlite.connect(DATABASE_FILE)
+class ConnectionPool:
+    def __init__(self, database: str, max_size: int = MAX_POOL_SIZE, acquire_timeout: float = POOL_ACQUIRE_TIMEOUT, pragmas=READ_PRAGMAS):
+        self.database = database
+        self.max_size = max_size
+        self.pragmas = pragmas
+        self.acquire_timeout = acquire_timeout
+        self._idle: List[aiosqlite.Connection] = []
+        self._in_use: set = set()
+        self._retired: set = set()
+        self._size = 0
+        self._condition = asyncio.Condition()
 
-async def release_connection(conn):
-    if len(_connection_pool) < MAX_POOL_SIZE:
-        _connection_pool.append(conn)
-    else:
-        await conn.close()
+    def _has_capacity(self) -> bool:
+        return bool(self._idle) or self._size < self.max_size
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.database)
+        try:
+            for pragma in self.pragmas:
+                await conn.execute(pragma)
+        except Exception:
+            await self._close_quietly(conn)
+            raise
+        return conn
+
+    async def _is_healthy(self, conn: aiosqlite.Connection) -> bool:
+        try:
+            async with conn.execute('SELECT 1') as cursor:
+                await cursor.fetchone()
+            return True
+        except Exception:
+            return False
+
+    async def _close_quietly(self, conn: aiosqlite.Connection):
+        try:
+            await conn.close()
+        except Exception as e:
+            logging.debug(f"Error closing database connection: {e}")
+
+    async def acquire(self) -> aiosqlite.Connection:
+        async with self._condition:
+            await asyncio.wait_for(self._condition.wait_for(self._has_capacity), self.acquire_timeout)
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._size += 1
+        if conn is not None and not await self._is_healthy(conn):
+            logging.warning("Discarding unhealthy database connection")
+            await self._close_quietly(conn)
+            conn = None
+        if conn is None:
+            try:
+                conn = await self._open()
+            except Exception:
+                async with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+        self._in_use.add(conn)
+        return conn
+
+    async def release(self, conn: aiosqlite.Connection, discard: bool = False):
+        self._in_use.discard(conn)
+        if conn in self._retired:
+            self._retired.discard(conn)
+            await self._close_quietly(conn)
+            return
+        if not discard and conn.in_transaction:
+            try:
+                await conn.rollback()
+            except Exception:
+                discard = True
+        async with self._condition:
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+        if discard:
+            await self._close_quietly(conn)
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self):
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._retired.update(self._in_use)
+            self._size -= len(idle) + len(self._in_use)
+            self._condition.notify_all()
+        for conn in idle:
+            await self._close_quietly(conn)
+
+class DatabaseWriter:
+    def __init__(self, database: str, batch_window: float = WRITE_BATCH_WINDOW, batch_max: int = WRITE_BATCH_MAX):
+        self.database = database
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._conn = None
+        self._task = None
+
+    async def submit(self, operation):
+        """Queue an async callable taking the write connection and wait until its transaction commits"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    async def execute(self, sql_operation, args=()):
+        async def operation(conn):
+            async with conn.execute(sql_operation, args):
+                pass
+        return await self.submit(operation)
+
+    async def executemany(self, sql_operation, rows):
+        async def operation(conn):
+            await conn.executemany(sql_operation, rows)
+        return await self.submit(operation)
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            conn = await aiosqlite.connect(self.database, isolation_level=None)
+            try:
+                for pragma in WRITE_PRAGMAS:
+                    await conn.execute(pragma)
+            except Exception:
+                await conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    async def _disconnect(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception as e:
+                logging.debug(f"Error closing writer connection: {e}")
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        await asyncio.sleep(self.batch_window)
+        while len(batch) < self.batch_max and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _commit_batch(self, batch: list):
+        conn = await self._connect()
+        outcomes = []
+        await conn.execute('BEGIN IMMEDIATE')
+        try:
+            for operation, future in batch:
+                if future.done():
+                    continue
+                await conn.execute('SAVEPOINT write_op')
+                try:
+                    outcomes.append((future, await operation(conn), None))
+                except Exception as e:
+                    await conn.execute('ROLLBACK TO write_op')
+                    outcomes.append((future, None, e))
+                await conn.execute('RELEASE write_op')
+            await conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                await conn.execute('ROLLBACK')
+            raise
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._commit_batch(batch)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logging.error(f"Failed to commit write batch of {len(batch)} operations: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                await self._disconnect()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def close(self):
+        if self._task and not self._task.done():
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self._disconnect()
+
+_pool = ConnectionPool(DATABASE_FILE)
+_writer = DatabaseWriter(DATABASE_FILE)
+_points_listeners: List[callable] = []
+_thread_active_cache = TTLCache(THREAD_CACHE_SIZE, THREAD_CACHE_TTL)
+_thread_languages_cache = TTLCache(THREAD_CACHE_SIZE, THREAD_CACHE_TTL)
+_points_reply_cache = TTLCache(REPLY_CACHE_SIZE, REPLY_CACHE_TTL)
+
+def add_points_listener(callback):
+    if callback not in _points_listeners:
+        _points_listeners.append(callback)
+
+def _notify_points_changed(user_id: int, points: int):
+    for callback in _points_listeners:
+        try:
+            callback(user_id, points)
+        except Exception as e:
+            logging.error(f"Points listener failed for user {user_id}: {e}")
+
+async def close_database():
+    await _writer.close()
+    await _pool.close()
+
+async def backup_database(target: str):
+    """Copy a consistent snapshot of the database, including pages still in the WAL, to target"""
+    async with _pool.connection() as conn:
+        async with aiosqlite.connect(target) as backup:
+            await conn.backup(backup)
+
+async def _create_tables(conn):
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_points (
+            user_id INTEGER PRIMARY KEY,
+            points INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS checkmark_logs (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS translation_threads (
+            thread_id INTEGER PRIMARY KEY,
+            is_active BOOLEAN NOT NULL DEFAULT 1
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_language_preferences (
+            thread_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            PRIMARY KEY (thread_id, user_id)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS thread_languages (
+            thread_id INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            PRIMARY KEY (thread_id, language)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS language_usage_stats (
+            user_id INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, language)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS points_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            message_id INTEGER,
+            actor_id INTEGER,
+            timestamp INTEGER NOT NULL
+        )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_points_ledger_user ON points_ledger (user_id)')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS points_replies (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            reply_id INTEGER NOT NULL,
+            total_points INTEGER NOT NULL,
+            reasons TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_points_replies_updated ON points_replies (updated_at)')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS translation_cache (
+            cache_key TEXT PRIMARY KEY,
+            detected_language TEXT NOT NULL,
+            translations TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            last_used INTEGER NOT NULL
+        )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_translation_cache_last_used ON translation_cache (last_used)')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS translation_jobs (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            target_langs TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at INTEGER NOT NULL,
+            reply_message_id INTEGER,
+            last_error TEXT,
+            created_at INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_translation_jobs_status ON translation_jobs (status, available_at)')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS translation_snapshots (
+            kind TEXT NOT NULL,
+            key INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (kind, key)
+        )
+    ''')
+    await conn.execute(
+        "INSERT INTO points_ledger (user_id, delta, source, timestamp) "
+        "SELECT user_id, points, 'opening_balance', ? FROM user_points "
+        "WHERE points != 0 AND user_id NOT IN (SELECT user_id FROM points_ledger)",
+        (int(time.time()),)
+    )
 
 async def initialize_database():
     try:
-        async with aiosqlite.connect(DATABASE_FILE) as conn:
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS user_points (
-                    user_id INTEGER PRIMARY KEY,
-                    points INTEGER NOT NULL DEFAULT 0
-                )
-            ''')
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS checkmark_logs (
-                    message_id INTEGER PRIMARY KEY,
-                    channel_id INTEGER NOT NULL,
-                    timestamp INTEGER NOT NULL
-                )
-            ''')
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS translation_threads (
-                    thread_id INTEGER PRIMARY KEY,
-                    is_active BOOLEAN NOT NULL DEFAULT 1
-                )
-            ''')
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS user_language_preferences (
-                    thread_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    language TEXT NOT NULL,
-                    PRIMARY KEY (thread_id, user_id)
-                )
-            ''')
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS thread_languages (
-                    thread_id INTEGER NOT NULL,
-                    language TEXT NOT NULL,
-                    PRIMARY KEY (thread_id, language)
-                )
-            ''')
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS language_usage_stats (
-                    user_id INTEGER NOT NULL,
-                    language TEXT NOT NULL,
-                    message_count INTEGER NOT NULL DEFAULT 0,
-                    PRIMARY KEY (user_id, language)
-                )
-            ''')
-            await conn.commit()
+        await _writer.submit(_create_tables)
     except Exception as e:
         logging.error(f"Error initializing database: {e}")
 
 async def db_access_with_retry(sql_operation, args=(), max_attempts=5, delay=1):
     for attempt in range(max_attempts):
-        conn = None
         try:
-            conn = await get_connection()
-            async with conn.cursor() as cursor:
-                await cursor.execute(sql_operation, args)
-                if sql_operation.strip().upper().startswith('SELECT'):
-                    results = await cursor.fetchall()
-                    await release_connection(conn)
-                    return results
-                await conn.commit()
-            await release_connection(conn)
+            if sql_operation.strip().upper().startswith('SELECT'):
+                async with _pool.connection() as conn:
+                    async with conn.execute(sql_operation, args) as cursor:
+                        return await cursor.fetchall()
+            await _writer.execute(sql_operation, args)
             return
         except aiosqlite.OperationalError as e:
-            if conn:
-                await conn.close()
             logging.error(f"Failed to execute sql operation: {e}")
             if attempt == max_attempts - 1:
                 raise
@@ -100,17 +407,74 @@ async def initialize_points_database(user):
     rows = await db_access_with_retry('SELECT points FROM user_points WHERE user_id = ?', (user.id,))
     if not rows:
         await db_access_with_retry('INSERT INTO user_points (user_id, points) VALUES (?, ?)', (user.id, 0))
+        _notify_points_changed(user.id, 0)
         return 0
     return rows[0][0]
 
+async def _record_points_change(conn, user_id, delta, source, message_id=None, actor_id=None):
+    await conn.execute(
+        'INSERT INTO points_ledger (user_id, delta, source, message_id, actor_id, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+        (user_id, delta, source, message_id, actor_id, int(time.time()))
+    )
+
+async def add_points(user_id: int, delta: int, source: str, message_id: int = None, actor_id: int = None) -> int | None:
+    async def operation(conn):
+        await _record_points_change(conn, user_id, delta, source, message_id, actor_id)
+        async with conn.execute(
+            'INSERT INTO user_points (user_id, points) VALUES (?, ?) '
+            'ON CONFLICT(user_id) DO UPDATE SET points = points + excluded.points RETURNING points',
+            (user_id, delta)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+    try:
+        points = await _writer.submit(operation)
+    except Exception as e:
+        logging.error(f"Failed to add points: {e}")
+        return None
+    _notify_points_changed(user_id, points)
+    return points
+
 async def update_points(user_id, points):
+    async def operation(conn):
+        async with conn.execute('SELECT points FROM user_points WHERE user_id = ?', (user_id,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return False
+        if row[0] != points:
+            await _record_points_change(conn, user_id, points - row[0], 'set')
+            await conn.execute('UPDATE user_points SET points = ? WHERE user_id = ?', (points, user_id))
+        return True
     try:
-        await db_access_with_retry('UPDATE user_points SET points = ? WHERE user_id = ?', (points, user_id))
+        if await _writer.submit(operation):
+            _notify_points_changed(user_id, points)
         return True
     except Exception as e:
         logging.error(f"Failed to update points: {e}")
         return False
 
+async def get_points_ledger(user_id: int, limit: int = 50) -> list[tuple]:
+    return await db_access_with_retry(
+        'SELECT delta, source, message_id, actor_id, timestamp FROM points_ledger '
+        'WHERE user_id = ? ORDER BY id DESC LIMIT ?',
+        (user_id, limit)
+    )
+
+async def rebuild_user_points(user_id: int) -> int:
+    """Recompute a user's stored total from their ledger entries"""
+    async def operation(conn):
+        async with conn.execute(
+            'INSERT INTO user_points (user_id, points) '
+            'SELECT ?, COALESCE(SUM(delta), 0) FROM points_ledger WHERE user_id = ? '
+            'ON CONFLICT(user_id) DO UPDATE SET points = excluded.points RETURNING points',
+            (user_id, user_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+    points = await _writer.submit(operation)
+    _notify_points_changed(user_id, points)
+    return points
+
 async def get_user_points(user_id):
     rows = await db_access_with_retry('SELECT points FROM user_points WHERE user_id = ?', (user_id,))
     if rows:
@@ -125,26 +489,75 @@ async def log_checkmark_message_id(message_id, channel_id, timestamp):
         logging.error(f"Failed to log checkmark message ID: {e}")
         return False
 
+async def get_points_reply(message_id: int) -> tuple[int, int, List[str]] | None:
+    cached = _points_reply_cache.get(message_id)
+    if cached is not None:
+        return cached
+    rows = await db_access_with_retry(
+        'SELECT reply_id, total_points, reasons FROM points_replies WHERE message_id = ?',
+        (message_id,)
+    )
+    if not rows:
+        return None
+    reply = (rows[0][0], rows[0][1], json.loads(rows[0][2]))
+    _points_reply_cache.set(message_id, reply)
+    return reply
+
+async def save_points_reply(message_id: int, channel_id: int, reply_id: int, total_points: int, reasons: List[str]):
+    await db_access_with_retry(
+        'INSERT INTO points_replies (message_id, channel_id, reply_id, total_points, reasons, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(message_id) DO UPDATE SET reply_id = excluded.reply_id, '
+        'total_points = excluded.total_points, reasons = excluded.reasons, updated_at = excluded.updated_at',
+        (message_id, channel_id, reply_id, total_points, json.dumps(reasons, ensure_ascii=False), int(time.time()))
+    )
+    _points_reply_cache.set(message_id, (reply_id, total_points, list(reasons)))
+
+async def prune_points_replies(retention: int, gone_channels: List[int] = ()) -> int:
+    async def operation(conn):
+        expired = await conn.execute('DELETE FROM points_replies WHERE updated_at < ?', (int(time.time()) - retention,))
+        removed = expired.rowcount
+        for channel_id in gone_channels:
+            cursor = await conn.execute('DELETE FROM points_replies WHERE channel_id = ?', (channel_id,))
+            removed += cursor.rowcount
+        return removed
+    removed = await _writer.submit(operation)
+    if removed:
+        _points_reply_cache.clear()
+    return removed
+
 async def set_thread_active(thread_id: int, active: bool = True):
     await db_access_with_retry(
         'INSERT INTO translation_threads (thread_id, is_active) VALUES (?, ?) '
         'ON CONFLICT(thread_id) DO UPDATE SET is_active = ?',
         (thread_id, active, active)
     )
+    _thread_active_cache.set(thread_id, bool(active))
 
 async def is_thread_active(thread_id: int) -> bool:
+    cached = _thread_active_cache.get(thread_id)
+    if cached is not None:
+        return cached
     rows = await db_access_with_retry(
         'SELECT is_active FROM translation_threads WHERE thread_id = ?',
         (thread_id,)
     )
-    return bool(rows and rows[0][0])
+    active = bool(rows and rows[0][0])
+    _thread_active_cache.set(thread_id, active)
+    return active
 
-async def set_user_language(thread_id: int, user_id: int, language: str):
-    await db_access_with_retry(
-        'INSERT INTO user_language_preferences (thread_id, user_id, language) VALUES (?, ?, ?) '
-        'ON CONFLICT(thread_id, user_id) DO UPDATE SET language = ?',
-        (thread_id, user_id, language, language)
-    )
+async def get_active_threads(thread_ids) -> set[int]:
+    thread_ids = list(thread_ids)
+    active = set()
+    for start in range(0, len(thread_ids), ACTIVE_QUERY_CHUNK):
+        chunk = thread_ids[start:start + ACTIVE_QUERY_CHUNK]
+        rows = await db_access_with_retry(
+            f'SELECT thread_id FROM translation_threads WHERE is_active = 1 AND thread_id IN ({",".join("?" * len(chunk))})',
+            tuple(chunk)
+        )
+        active.update(row[0] for row in rows)
+    for thread_id in thread_ids:
+        _thread_active_cache.set(thread_id, thread_id in active)
+    return active
 
 async def get_user_language(thread_id: int, user_id: int) -> str:
     rows = await db_access_with_retry(
@@ -158,35 +571,39 @@ async def add_thread_language(thread_id: int, language: str):
         'INSERT OR IGNORE INTO thread_languages (thread_id, language) VALUES (?, ?)',
         (thread_id, language)
     )
+    _thread_languages_cache.pop(thread_id)
 
 async def remove_thread_language(thread_id: int, language: str):
     await db_access_with_retry(
         'DELETE FROM thread_languages WHERE thread_id = ? AND language = ?',
         (thread_id, language)
     )
+    _thread_languages_cache.pop(thread_id)
 
 async def get_thread_languages(thread_id: int) -> list[str]:
+    cached = _thread_languages_cache.get(thread_id)
+    if cached is not None:
+        return list(cached)
     rows = await db_access_with_retry(
         'SELECT language FROM thread_languages WHERE thread_id = ?',
         (thread_id,)
     )
-    return [row[0] for row in rows]
+    languages = tuple(row[0] for row in rows)
+    _thread_languages_cache.set(thread_id, languages)
+    return list(languages)
 
 async def clear_thread_data(thread_id: int):
     """Centralized function to clear all data related to a thread"""
-    async with aiosqlite.connect(DATABASE_FILE) as conn:
+    async def operation(conn):
         await conn.execute('DELETE FROM translation_threads WHERE thread_id = ?', (thread_id,))
         await conn.execute('DELETE FROM user_language_preferences WHERE thread_id = ?', (thread_id,))
         await conn.execute('DELETE FROM thread_languages WHERE thread_id = ?', (thread_id,))
         await conn.execute('DELETE FROM checkmark_logs WHERE channel_id = ?', (thread_id,))
-        await conn.commit()
-
-async def update_language_usage(user_id: int, language: str):
-    await db_access_with_retry(
-        'INSERT INTO language_usage_stats (user_id, language, message_count) VALUES (?, ?, 1) '
-        'ON CONFLICT(user_id, language) DO UPDATE SET message_count = message_count + 1',
-        (user_id, language)
-    )
+        await conn.execute("DELETE FROM translation_snapshots WHERE kind = 'thread' AND key = ?", (thread_id,))
+        await conn.execute('DELETE FROM translation_jobs WHERE channel_id = ?', (thread_id,))
+    await _writer.submit(operation)
+    _thread_active_cache.pop(thread_id)
+    _thread_languages_cache.pop(thread_id)
 
 async def get_language_usage(user_id: int) -> Dict[str, int]:
     rows = await db_access_with_retry(
@@ -195,12 +612,225 @@ async def get_language_usage(user_id: int) -> Dict[str, int]:
     )
     return {row[0]: row[1] for row in rows} if rows else {}
 
+async def get_language_usage_bulk(user_ids) -> Dict[int, Dict[str, int]]:
+    user_ids = list(user_ids)
+    usage: Dict[int, Dict[str, int]] = {user_id: {} for user_id in user_ids}
+    for start in range(0, len(user_ids), ACTIVE_QUERY_CHUNK):
+        chunk = user_ids[start:start + ACTIVE_QUERY_CHUNK]
+        rows = await db_access_with_retry(
+            f'SELECT user_id, language, message_count FROM language_usage_stats WHERE user_id IN ({",".join("?" * len(chunk))})',
+            tuple(chunk)
+        )
+        for user_id, language, message_count in rows:
+            usage[user_id][language] = message_count
+    return usage
+
+async def flush_language_state(usage_rows: List[tuple], preference_rows: List[tuple]):
+    async def operation(conn):
+        if usage_rows:
+            await conn.executemany(
+                'INSERT INTO language_usage_stats (user_id, language, message_count) VALUES (?, ?, ?) '
+                'ON CONFLICT(user_id, language) DO UPDATE SET message_count = message_count + excluded.message_count',
+                usage_rows
+            )
+        if preference_rows:
+            await conn.executemany(
+                'INSERT INTO user_language_preferences (thread_id, user_id, language) VALUES (?, ?, ?) '
+                'ON CONFLICT(thread_id, user_id) DO UPDATE SET language = excluded.language',
+                preference_rows
+            )
+    await _writer.submit(operation)
+
 async def clear_language_usage(user_id: int):
     await db_access_with_retry(
         'DELETE FROM language_usage_stats WHERE user_id = ?',
         (user_id,)
     )
 
+async def get_cached_translation(cache_key: str, ttl: int) -> tuple[str, Dict[str, str]] | None:
+    rows = await db_access_with_retry(
+        'SELECT detected_language, translations FROM translation_cache WHERE cache_key = ? AND created_at >= ?',
+        (cache_key, int(time.time()) - ttl)
+    )
+    if not rows:
+        return None
+    return rows[0][0], json.loads(rows[0][1])
+
+async def touch_cached_translation(cache_key: str):
+    await db_access_with_retry(
+        'UPDATE translation_cache SET last_used = ? WHERE cache_key = ?',
+        (int(time.time()), cache_key)
+    )
+
+async def store_cached_translation(cache_key: str, detected_language: str, translations: Dict[str, str]):
+    payload = json.dumps(translations, ensure_ascii=False)
+    now = int(time.time())
+    await db_access_with_retry(
+        'INSERT OR REPLACE INTO translation_cache '
+        '(cache_key, detected_language, translations, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+        (cache_key, detected_language, payload, len(cache_key) + len(detected_language) + len(payload.encode()), now, now)
+    )
+
+async def prune_translation_cache(ttl: int, max_bytes: int) -> int:
+    async def operation(conn):
+        expired = await conn.execute('DELETE FROM translation_cache WHERE created_at < ?', (int(time.time()) - ttl,))
+        evicted = await conn.execute(
+            'DELETE FROM translation_cache WHERE cache_key IN ('
+            'SELECT cache_key FROM (SELECT cache_key, SUM(size) OVER (ORDER BY last_used DESC, cache_key) AS running '
+            'FROM translation_cache) WHERE running > ?)',
+            (max_bytes,)
+        )
+        return expired.rowcount + evicted.rowcount
+    return await _writer.submit(operation)
+
+async def enqueue_translation_job(
+    message_id: int,
+    channel_id: int,
+    user_id: int,
+    username: str,
+    content: str,
+    target_langs
+):
+    now = int(time.time())
+    await db_access_with_retry(
+        'INSERT OR IGNORE INTO translation_jobs '
+        '(message_id, channel_id, user_id, username, content, target_langs, available_at, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (message_id, channel_id, user_id, username, content, json.dumps(sorted(target_langs)), now, now, now)
+    )
+
+async def merge_translation_jobs(
+    dropped_id: int,
+    message_id: int,
+    channel_id: int,
+    user_id: int,
+    username: str,
+    content: str,
+    target_langs
+):
+    """Store merged content on the surviving job and drop the absorbed one in one transaction"""
+    now = int(time.time())
+    async def operation(conn):
+        await conn.execute(
+            'INSERT INTO translation_jobs '
+            '(message_id, channel_id, user_id, username, content, target_langs, available_at, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(message_id) DO UPDATE SET content = excluded.content, '
+            'target_langs = excluded.target_langs, updated_at = excluded.updated_at',
+            (message_id, channel_id, user_id, username, content, json.dumps(sorted(target_langs)), now, now, now)
+        )
+        await conn.execute(
+            "UPDATE translation_jobs SET status = 'dropped', updated_at = ? WHERE message_id = ?",
+            (now, dropped_id)
+        )
+    await _writer.submit(operation)
+
+async def lease_translation_jobs(message_ids: List[int], visibility_timeout: int, max_attempts: int) -> set[int]:
+    if not message_ids:
+        return set()
+    now = int(time.time())
+    async def operation(conn):
+        async with conn.execute(
+            f"UPDATE translation_jobs SET status = 'leased', attempts = attempts + 1, available_at = ?, updated_at = ? "
+            f"WHERE message_id IN ({','.join('?' * len(message_ids))}) "
+            f"AND status IN ('pending', 'leased') AND available_at <= ? AND attempts < ? "
+            f"RETURNING message_id",
+            (now + visibility_timeout, now, *message_ids, now, max_attempts)
+        ) as cursor:
+            return {row[0] for row in await cursor.fetchall()}
+    return await _writer.submit(operation)
+
+async def complete_translation_job(message_id: int, reply_message_id: int | None):
+    await db_access_with_retry(
+        "UPDATE translation_jobs SET status = 'done', reply_message_id = ?, updated_at = ? WHERE message_id = ?",
+        (reply_message_id, int(time.time()), message_id)
+    )
+
+async def finish_translation_jobs(message_ids: List[int], status: str):
+    now = int(time.time())
+    await _writer.executemany(
+        'UPDATE translation_jobs SET status = ?, updated_at = ? WHERE message_id = ?',
+        [(status, now, message_id) for message_id in message_ids]
+    )
+
+async def release_translation_jobs(message_ids: List[int], error: str, max_attempts: int, retry_delay: int):
+    now = int(time.time())
+    await _writer.executemany(
+        "UPDATE translation_jobs SET "
+        "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+        "available_at = ? + ? * (1 << MIN(attempts, 6)), last_error = ?, updated_at = ? "
+        "WHERE message_id = ? AND status = 'leased'",
+        [(max_attempts, now, retry_delay, error, now, message_id) for message_id in message_ids]
+    )
+
+async def fetch_recoverable_translation_jobs(max_attempts: int, max_age: int, limit: int) -> list[tuple]:
+    now = int(time.time())
+    async def operation(conn):
+        await conn.execute(
+            "UPDATE translation_jobs SET status = 'failed', updated_at = ? "
+            "WHERE status IN ('pending', 'leased') AND available_at <= ? AND attempts >= ?",
+            (now, now, max_attempts)
+        )
+        await conn.execute(
+            "UPDATE translation_jobs SET status = 'expired', updated_at = ? "
+            "WHERE status IN ('pending', 'leased') AND created_at < ?",
+            (now, now - max_age)
+        )
+        async with conn.execute(
+            "SELECT message_id, channel_id, user_id, username, content, target_langs, attempts FROM translation_jobs "
+            "WHERE status IN ('pending', 'leased') AND available_at <= ? ORDER BY message_id LIMIT ?",
+            (now, limit)
+        ) as cursor:
+            return await cursor.fetchall()
+    return await _writer.submit(operation)
+
+async def get_translation_job(message_id: int) -> tuple[str, set[str], int | None] | None:
+    rows = await db_access_with_retry(
+        "SELECT content, target_langs, reply_message_id FROM translation_jobs WHERE message_id = ? AND status = 'done'",
+        (message_id,)
+    )
+    if not rows:
+        return None
+    content, target_langs, reply_message_id = rows[0]
+    return content, set(json.loads(target_langs)), reply_message_id
+
+async def update_translation_job_content(message_id: int, content: str):
+    await db_access_with_retry(
+        'UPDATE translation_jobs SET content = ?, updated_at = ? WHERE message_id = ?',
+        (content, int(time.time()), message_id)
+    )
+
+async def prune_translation_jobs(retention: int) -> int:
+    async def operation(conn):
+        async with conn.execute(
+            "DELETE FROM translation_jobs WHERE status IN ('done', 'failed', 'dropped', 'expired') AND updated_at < ?",
+            (int(time.time()) - retention,)
+        ) as cursor:
+            return cursor.rowcount
+    return await _writer.submit(operation)
+
+async def save_translation_snapshot(threads: Dict[int, str], user_ids: List[int], max_age: int):
+    now = int(time.time())
+    rows = [('thread', thread_id, payload, now) for thread_id, payload in threads.items()]
+    rows.extend(('user', user_id, '', now) for user_id in user_ids)
+    async def operation(conn):
+        await conn.executemany(
+            'INSERT INTO translation_snapshots (kind, key, payload, updated_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(kind, key) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at',
+            rows
+        )
+        await conn.execute('DELETE FROM translation_snapshots WHERE updated_at < ?', (now - max_age,))
+    await _writer.submit(operation)
+
+async def load_translation_snapshot(max_age: int) -> tuple[Dict[int, str], List[int]]:
+    rows = await db_access_with_retry(
+        'SELECT kind, key, payload FROM translation_snapshots WHERE updated_at >= ? ORDER BY updated_at',
+        (int(time.time()) - max_age,)
+    )
+    threads = {key: payload for kind, key, payload in rows if kind == 'thread'}
+    user_ids = [key for kind, key, _ in rows if kind == 'user']
+    return threads, user_ids
+
 class ThreadCleanupManager:
     def __init__(self, bot):
         self.bot = bot
@@ -208,7 +838,7 @@ class ThreadCleanupManager:
         self.cleanup_handlers: Dict[str, callable] = {}
 
     async def cleanup_threads(self) -> Dict[str, int]:
-        stats = {'threads': 0, 'reactions': 0, 'checkmarks': 0}
+        stats = {'threads': 0, 'reactions': 0, 'checkmarks': 0, 'replies': 0}
         try:
             trans_rows = await db_access_with_retry('SELECT thread_id FROM translation_threads')
             for (thread_id,) in trans_rows:
@@ -240,6 +870,11 @@ class ThreadCleanupManager:
                         except disnake.NotFound:
                             pass
                     stats['checkmarks'] += 1
+            reply_channels = await db_access_with_retry('SELECT DISTINCT channel_id FROM points_replies')
+            stats['replies'] = await prune_points_replies(
+                POINTS_REPLY_RETENTION,
+                [channel_id for (channel_id,) in reply_channels if not self.bot.get_channel(channel_id)]
+            )
             return stats
         except Exception as e:
             logging.error(f"Error during cleanup: {e}")
@@ -260,7 +895,8 @@ class DatabaseCog(commands.Cog):
                     logging.info(
                         f"Cleanup completed: {stats['threads']} threads, "
                         f"{stats['checkmarks']} checkmarks, "
-                        f"{stats['reactions']} reactions"
+                        f"{stats['reactions']} reactions, "
+                        f"{stats['replies']} points replies"
                     )
                 await asyncio.sleep(3600)
             except asyncio.CancelledError:
@@ -278,11 +914,7 @@ class DatabaseCog(commands.Cog):
     def cog_unload(self):
         if self._cleanup_task:
             self._cleanup_task.cancel()
-        async def cleanup():
-            for conn in _connection_pool:
-                await conn.close()
-            _connection_pool.clear()
-        asyncio.create_task(cleanup())
+        asyncio.create_task(close_database())
 
 def setup(bot):
     bot.add_cog(DatabaseCog(bot))
\ No newline at end of file
@@ -0,0 +1,128 @@
+# modules.utils.langdetect
+
+from modules.utils import segments
+from collections import Counter
+from typing import Dict, List
+from pathlib import Path
+import unicodedata
+import json
+import re
+
+PROFILE_FILE = Path(__file__).with_name('language_profiles.json')
+PROFILE_SIZE = 300
+MIN_LETTERS = 12
+MAX_SAMPLE_LENGTH = 1000
+MIN_SCRIPT_SHARE = 0.6
+MIN_MARGIN = 0.04
+MAX_DISTANCE = 0.57
+CYRILLIC_LANGUAGES = ['russian', 'ukrainian', 'bulgarian', 'belarusian', 'serbian']
+# Profiled only so that close relatives of the supported languages are rejected instead of mislabelled
+UNSUPPORTED_LANGUAGES = {
+    'afrikaans', 'indonesian', 'danish', 'norwegian', 'catalan',
+    'romanian', 'czech', 'bulgarian', 'belarusian', 'serbian',
+}
+
+SCRIPT_RANGES = [
+    ('hangul', [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)]),
+    ('kana', [(0x3040, 0x30FF), (0x31F0, 0x31FF)]),
+    ('han', [(0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)]),
+    ('thai', [(0x0E00, 0x0E7F)]),
+    ('greek', [(0x0370, 0x03FF), (0x1F00, 0x1FFF)]),
+    ('hebrew', [(0x0590, 0x05FF)]),
+    ('arabic', [(0x0600, 0x06FF), (0x0750, 0x077F)]),
+    ('devanagari', [(0x0900, 0x097F)]),
+    ('cyrillic', [(0x0400, 0x04FF)]),
+]
+
+# Only scripts written by a single language; shared ones (Arabic, Hebrew, Devanagari) are left to the model
+SCRIPT_LANGUAGES = {
+    'hangul': 'korean',
+    'kana': 'japanese',
+    'thai': 'thai',
+    'greek': 'greek',
+}
+
+_profiles: Dict[str, Dict[str, int]] | None = None
+
+def strip_untranslatable(text: str) -> str:
+    return segments.strip(text)
+
+def _script_of(char: str) -> str:
+    code = ord(char)
+    for script, ranges in SCRIPT_RANGES:
+        if any(start <= code <= end for start, end in ranges):
+            return script
+    return 'latin'
+
+def _letters(text: str) -> str:
+    return ''.join(char for char in text if unicodedata.category(char).startswith('L'))
+
+def ngrams(text: str, max_n: int = 3) -> Counter:
+    counts = Counter()
+    words = re.findall(r'[^\W\d_]+', text.lower())
+    for word in words:
+        padded = f" {word} "
+        for n in range(1, max_n + 1):
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                if gram != ' ':
+                    counts[gram] += 1
+    return counts
+
+def build_profile(text: str, size: int = PROFILE_SIZE) -> List[str]:
+    return [gram for gram, _ in sorted(ngrams(text).items(), key=lambda item: (-item[1], item[0]))[:size]]
+
+def _load_profiles() -> Dict[str, Dict[str, int]]:
+    global _profiles
+    if _profiles is None:
+        raw = json.loads(PROFILE_FILE.read_text(encoding='utf-8'))
+        _profiles = {lang: {gram: rank for rank, gram in enumerate(grams)} for lang, grams in raw.items()}
+    return _profiles
+
+def _classify_ngrams(text: str, candidates: List[str] = None) -> tuple[str | None, float, float]:
+    """Return the closest profile with its normalised distance and its lead over the runner-up"""
+    profiles = _load_profiles()
+    document = build_profile(text)
+    if not document:
+        return None, 1.0, 0.0
+    max_distance = PROFILE_SIZE * len(document)
+    scores = []
+    for lang, profile in profiles.items():
+        if candidates and lang not in candidates:
+            continue
+        distance = sum(abs(profile[gram] - rank) if gram in profile else PROFILE_SIZE for rank, gram in enumerate(document))
+        scores.append((distance / max_distance, lang))
+    if not scores:
+        return None, 1.0, 0.0
+    scores.sort()
+    best_distance, best_lang = scores[0]
+    margin = scores[1][0] - best_distance if len(scores) > 1 else 1.0
+    return best_lang, best_distance, margin
+
+def detect_language(text: str) -> str | None:
+    """Return the full language name of text when it can be identified confidently, otherwise None"""
+    text = strip_untranslatable(text)[:MAX_SAMPLE_LENGTH]
+    letters = _letters(text)
+    if len(letters) < MIN_LETTERS:
+        return None
+    scripts = Counter(_script_of(char) for char in letters)
+    script, count = scripts.most_common(1)[0]
+    if count / len(letters) < MIN_SCRIPT_SHARE:
+        return None
+    if script == 'han':
+        return 'japanese' if scripts.get('kana') else 'chinese'
+    if script in SCRIPT_LANGUAGES:
+        return SCRIPT_LANGUAGES[script]
+    if script == 'cyrillic':
+        candidates = CYRILLIC_LANGUAGES
+    elif script == 'latin':
+        candidates = [lang for lang in _load_profiles() if lang not in CYRILLIC_LANGUAGES]
+    else:
+        return None
+    lang, distance, margin = _classify_ngrams(text, candidates)
+    if lang in UNSUPPORTED_LANGUAGES or distance > MAX_DISTANCE or margin < MIN_MARGIN:
+        return None
+    return lang
+
+def has_translatable_text(text: str) -> bool:
+    return len(_letters(strip_untranslatable(text))) >= 2
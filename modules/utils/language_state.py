@@ -0,0 +1,126 @@
+# modules.utils.language_state
+
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Tuple
+
+class UserLanguageUsage:
+    __slots__ = ('counts', 'total', 'top_language', 'top_count')
+
+    def __init__(self, counts: Dict[str, int] | None = None):
+        self.counts: Dict[str, int] = dict(counts or {})
+        self.total = sum(self.counts.values())
+        self.top_language, self.top_count = max(self.counts.items(), key=lambda item: item[1], default=(None, 0))
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def add(self, language: str, count: int = 1):
+        self.counts[language] = self.counts.get(language, 0) + count
+        self.total += count
+        if self.counts[language] > self.top_count:
+            self.top_language, self.top_count = language, self.counts[language]
+
+    def preferred(self, min_messages: int, threshold_percent: float) -> str | None:
+        if self.total < min_messages or self.top_count * 100 <= threshold_percent * self.total:
+            return None
+        return self.top_language
+
+class LanguageState:
+    """Language usage counters and per-thread preferences, with pending writes collected for batched flushes.
+    Both maps are LRUs that only evict entries without unflushed changes"""
+
+    def __init__(self, max_users: int, max_preferences: int):
+        self.max_users = max_users
+        self.max_preferences = max_preferences
+        self.usage: OrderedDict[int, UserLanguageUsage] = OrderedDict()
+        self.preferences: OrderedDict[Tuple[int, int], str | None] = OrderedDict()
+        self._dirty_usage: Dict[Tuple[int, str], int] = defaultdict(int)
+        self._dirty_preferences: Dict[Tuple[int, int], str] = {}
+
+    def __len__(self) -> int:
+        return len(self._dirty_usage) + len(self._dirty_preferences)
+
+    def _make_room(self, entries: OrderedDict, limit: int, dirty: set):
+        excess = len(entries) - limit + 1
+        if excess <= 0:
+            return
+        victims = []
+        for key in entries:
+            if key not in dirty:
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del entries[key]
+
+    def get_usage(self, user_id: int) -> UserLanguageUsage | None:
+        usage = self.usage.get(user_id)
+        if usage is not None:
+            self.usage.move_to_end(user_id)
+        return usage
+
+    def load_usage(self, user_id: int, counts: Dict[str, int]) -> UserLanguageUsage:
+        if user_id not in self.usage:
+            self._make_room(self.usage, self.max_users, {user_id for user_id, _ in self._dirty_usage})
+            self.usage[user_id] = UserLanguageUsage(counts)
+        return self.get_usage(user_id)
+
+    def record_usage(self, user_id: int, language: str) -> UserLanguageUsage:
+        usage = self.get_usage(user_id)
+        usage.add(language)
+        self._dirty_usage[(user_id, language)] += 1
+        return usage
+
+    def has_preference(self, thread_id: int, user_id: int) -> bool:
+        return (thread_id, user_id) in self.preferences
+
+    def get_preference(self, thread_id: int, user_id: int) -> str | None:
+        key = (thread_id, user_id)
+        if key not in self.preferences:
+            return None
+        self.preferences.move_to_end(key)
+        return self.preferences[key]
+
+    def load_preference(self, thread_id: int, user_id: int, language: str | None):
+        key = (thread_id, user_id)
+        if key not in self.preferences:
+            self._make_room(self.preferences, self.max_preferences, set(self._dirty_preferences))
+            self.preferences[key] = language
+
+    def set_preference(self, thread_id: int, user_id: int, language: str):
+        key = (thread_id, user_id)
+        if key not in self.preferences:
+            self._make_room(self.preferences, self.max_preferences, set(self._dirty_preferences))
+        self.preferences[key] = language
+        self.preferences.move_to_end(key)
+        self._dirty_preferences[key] = language
+
+    def reset_user(self, user_id: int):
+        self.usage.pop(user_id, None)
+        for key in [key for key in self._dirty_usage if key[0] == user_id]:
+            del self._dirty_usage[key]
+
+    def forget_thread(self, thread_id: int):
+        for key in [key for key in self.preferences if key[0] == thread_id]:
+            del self.preferences[key]
+        for key in [key for key in self._dirty_preferences if key[0] == thread_id]:
+            del self._dirty_preferences[key]
+
+    def take_dirty(self) -> tuple[List[tuple], List[tuple]]:
+        usage_rows = [(user_id, language, count) for (user_id, language), count in self._dirty_usage.items()]
+        preference_rows = [(thread_id, user_id, language) for (thread_id, user_id), language in self._dirty_preferences.items()]
+        self._dirty_usage.clear()
+        self._dirty_preferences.clear()
+        return usage_rows, preference_rows
+
+    def restore_dirty(self, usage_rows: List[tuple], preference_rows: List[tuple]):
+        for user_id, language, count in usage_rows:
+            self._dirty_usage[(user_id, language)] += count
+        for thread_id, user_id, language in preference_rows:
+            self._dirty_preferences.setdefault((thread_id, user_id), language)
+
+    def clear(self):
+        self.usage.clear()
+        self.preferences.clear()
+        self._dirty_usage.clear()
+        self._dirty_preferences.clear()
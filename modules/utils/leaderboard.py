@@ -0,0 +1,70 @@
+# modules.utils.leaderboard
+
+from modules.utils.database import db_access_with_retry, add_points_listener
+from sortedcontainers import SortedList
+from typing import Dict, List, Tuple
+import asyncio
+import logging
+
+class LeaderboardIndex:
+    def __init__(self):
+        self._points: Dict[int, int] = {}
+        self._ranking = SortedList()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    async def ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            rows = await db_access_with_retry('SELECT user_id, points FROM user_points')
+            for user_id, points in rows:
+                if user_id not in self._points:
+                    self._set(user_id, points)
+            self._loaded = True
+            logging.info(f"Leaderboard index loaded with {len(self._points)} users")
+
+    def update(self, user_id: int, points: int):
+        self._set(user_id, points)
+
+    def _set(self, user_id: int, points: int):
+        previous = self._points.get(user_id)
+        if previous == points:
+            return
+        if previous is not None:
+            self._ranking.remove((-previous, user_id))
+        self._points[user_id] = points
+        self._ranking.add((-points, user_id))
+
+    def points_of(self, user_id: int) -> int | None:
+        return self._points.get(user_id)
+
+    def rank_of(self, user_id: int) -> int:
+        points = self._points.get(user_id)
+        if points is None:
+            return -1
+        return self._ranking.index((-points, user_id))
+
+    def _entries(self, start: int, stop: int) -> List[Tuple[int, int, int]]:
+        return [
+            (rank, user_id, -negative_points)
+            for rank, (negative_points, user_id) in enumerate(self._ranking.islice(start, stop), start)
+        ]
+
+    def top(self, n: int) -> List[Tuple[int, int, int]]:
+        return self._entries(0, n)
+
+    def neighbours(self, user_id: int, k: int) -> List[Tuple[int, int, int]]:
+        rank = self.rank_of(user_id)
+        if rank < 0:
+            return []
+        start = max(0, rank - k)
+        return self._entries(start, start + 2 * k + 1)
+
+leaderboard = LeaderboardIndex()
+add_points_listener(leaderboard.update)
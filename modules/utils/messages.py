@@ -0,0 +1,57 @@
+# modules.utils.messages
+
+from modules.utils.cache import TTLCache
+from collections import defaultdict
+from disnake.ext import commands
+from typing import Dict
+import disnake
+
+MESSAGE_CACHE_SIZE = 256
+MESSAGE_CACHE_TTL = 60
+
+async def fetch_message(bot, channel, message_id: int) -> disnake.Message:
+    cache = bot.get_cog('MessageCacheCog')
+    if cache is None:
+        return bot.get_message(message_id) or await channel.fetch_message(message_id)
+    return await cache.fetch_message(channel, message_id)
+
+def remember_message(bot, message: disnake.Message):
+    cache = bot.get_cog('MessageCacheCog')
+    if cache is not None:
+        cache.messages.set(message.id, message)
+
+class MessageCacheCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.messages = TTLCache(MESSAGE_CACHE_SIZE, MESSAGE_CACHE_TTL)
+        self.stats: Dict[str, int] = defaultdict(int)
+
+    async def fetch_message(self, channel, message_id: int) -> disnake.Message:
+        message = self.bot.get_message(message_id)
+        if message is not None:
+            self.stats['gateway'] += 1
+            return message
+        message = self.messages.get(message_id)
+        if message is not None:
+            self.stats['cached'] += 1
+            return message
+        message = await channel.fetch_message(message_id)
+        self.messages.set(message_id, message)
+        self.stats['fetched'] += 1
+        return message
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: disnake.RawMessageUpdateEvent):
+        self.messages.pop(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: disnake.RawMessageDeleteEvent):
+        self.messages.pop(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: disnake.RawBulkMessageDeleteEvent):
+        for message_id in payload.message_ids:
+            self.messages.pop(message_id)
+
+def setup(bot):
+    bot.add_cog(MessageCacheCog(bot))
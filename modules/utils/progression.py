@@ -1,6 +1,7 @@
 # modules.utils.progression
 
-from modules.utils.database import initialize_points_database, get_user_points, db_access_with_retry
+from modules.utils.database import initialize_points_database, get_user_points
+from modules.utils.leaderboard import leaderboard
 from bisect import bisect_right
 import datetime
 import disnake
@@ -21,24 +22,23 @@ role_thresholds = {
 sorted_thresholds = sorted(role_thresholds.keys())
 sorted_roles = [role_thresholds[threshold] for threshold in sorted_thresholds]
 
-async def calculate_user_rank_and_next_rank_name(ctx, user, role_thresholds):
-    await initialize_points_database(user)
-    current_points = await get_user_points(user.id)
+def get_rank_progress(guild, current_points):
     index = bisect_right(sorted_thresholds, current_points)
     current_threshold = sorted_thresholds[index - 1] if index > 0 else 0
-    next_threshold = sorted_thresholds[index] if index < len(sorted_thresholds) else max(role_thresholds.keys())
+    next_threshold = sorted_thresholds[index] if index < len(sorted_thresholds) else sorted_thresholds[-1]
     next_role_id = sorted_roles[index] if index < len(sorted_roles) else None
-    next_rank_role = ctx.guild.get_role(next_role_id) if next_role_id else None
+    next_rank_role = guild.get_role(next_role_id) if next_role_id else None
     next_rank_name = next_rank_role.name if next_rank_role else "Next Rank"
     points_needed = next_threshold - current_points if next_role_id else 0
-    all_user_points = await get_all_users_points()
-    sorted_users = sorted(all_user_points.items(), key=lambda x: x[1], reverse=True)
-    user_rank = next((index for index, (u_id, _) in enumerate(sorted_users) if u_id == user.id), -1)
-    return user_rank, next_rank_name, points_needed, current_threshold, next_threshold
+    return next_rank_name, points_needed, current_threshold, next_threshold
 
-async def get_all_users_points():
-    rows = await db_access_with_retry('SELECT user_id, points FROM user_points')
-    return {user_id: points for user_id, points in rows}
+async def calculate_user_rank_and_next_rank_name(ctx, user, role_thresholds):
+    await initialize_points_database(user)
+    current_points = await get_user_points(user.id)
+    next_rank_name, points_needed, current_threshold, next_threshold = get_rank_progress(ctx.guild, current_points)
+    await leaderboard.ensure_loaded()
+    user_rank = leaderboard.rank_of(user.id)
+    return user_rank, next_rank_name, points_needed, current_threshold, next_threshold
 
 def create_progress_bar(current, total, length=10, fill_symbols='🟩🟨🟧🟥'):
     if total == 0:
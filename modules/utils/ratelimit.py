@@ -0,0 +1,207 @@
+# modules.utils.ratelimit
+
+from contextlib import asynccontextmanager
+from collections import Counter
+from disnake.ext import commands
+from typing import Dict
+import itertools
+import asyncio
+import logging
+import random
+import openai
+import heapq
+import time
+
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200000
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+RESERVED_INTERACTIVE = 1
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_AUTO = 1
+PRIORITY_FUN = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_AUTO: 'auto', PRIORITY_FUN: 'fun'}
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+THROTTLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, asyncio.TimeoutError)
+
+def retry_after(error: Exception) -> float | None:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, minimum: float | None = None) -> float:
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, minimum or 0.0)
+
+class Lease:
+    __slots__ = ('estimate', 'tokens')
+
+    def __init__(self, estimate: int):
+        self.estimate = estimate
+        self.tokens = estimate
+
+class AdaptiveRateLimiter:
+    """Token buckets for requests and tokens plus an AIMD concurrency limit, served in priority order
+    with capacity held back for the interactive class"""
+
+    def __init__(
+        self,
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = TOKENS_PER_MINUTE,
+        min_concurrency: int = MIN_CONCURRENCY,
+        max_concurrency: int = MAX_CONCURRENCY,
+        reserved_interactive: int = RESERVED_INTERACTIVE
+    ):
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive = reserved_interactive
+        self.concurrency = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._waiters: list = []
+        self._sequence = itertools.count()
+        self._timer = None
+        self.stats: Dict[str, int] = {'granted': 0, 'throttled': 0, 'timeouts': 0}
+        self.class_stats: Dict[int, Dict[str, float]] = {
+            priority: {'granted': 0, 'total_wait': 0.0, 'max_wait': 0.0} for priority in PRIORITY_NAMES
+        }
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60)
+
+    def _wake_in(self, delay: float):
+        if self._timer is not None:
+            return
+        def wake():
+            self._timer = None
+            self._dispatch()
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.01), wake)
+
+    def _dispatch(self):
+        while self._waiters:
+            priority, _, tokens, enqueued_at, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            reserved = self.reserved_interactive if priority != PRIORITY_INTERACTIVE else 0
+            limit = max(self.min_concurrency, int(self.concurrency))
+            if self.in_flight >= max(1, limit - reserved):
+                return
+            now = time.monotonic()
+            if now < self.paused_until:
+                self._wake_in(self.paused_until - now)
+                return
+            self._refill(now)
+            tokens = min(tokens, self.token_capacity)
+            if self._requests < 1 + reserved or self._tokens < tokens:
+                request_wait = (1 + reserved - self._requests) * 60 / self.request_capacity
+                token_wait = (tokens - self._tokens) * 60 / self.token_capacity
+                self._wake_in(max(request_wait, token_wait))
+                return
+            heapq.heappop(self._waiters)
+            self._requests -= 1
+            self._tokens -= tokens
+            self.in_flight += 1
+            self.stats['granted'] += 1
+            self._record_wait(priority, now - enqueued_at)
+            future.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _record_wait(self, priority: int, wait: float):
+        stats = self.class_stats.setdefault(priority, {'granted': 0, 'total_wait': 0.0, 'max_wait': 0.0})
+        stats['granted'] += 1
+        stats['total_wait'] += wait
+        stats['max_wait'] = max(stats['max_wait'], wait)
+
+    def queue_metrics(self) -> Dict[str, Dict[str, float]]:
+        waiting = Counter(priority for priority, _, _, _, future in self._waiters if not future.done())
+        return {
+            PRIORITY_NAMES.get(priority, str(priority)): {
+                'waiting': waiting[priority],
+                'granted': stats['granted'],
+                'avg_wait': stats['total_wait'] / stats['granted'] if stats['granted'] else 0.0,
+                'max_wait': stats['max_wait'],
+            }
+            for priority, stats in sorted(self.class_stats.items())
+        }
+
+    def _release(self, lease: Lease | None = None, throttled: bool = False, delay: float | None = None):
+        self.in_flight -= 1
+        if lease is not None:
+            self._tokens = min(self.token_capacity, self._tokens + lease.estimate - lease.tokens)
+        if throttled:
+            self.stats['throttled'] += 1
+            self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+            if delay:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            logging.warning(f"Model API throttled, concurrency limit lowered to {self.concurrency:.1f}")
+        elif lease is not None:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        self._dispatch()
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_AUTO, timeout: float | None = None):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, time.monotonic(), future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    @asynccontextmanager
+    async def limit(self, tokens: int, priority: int = PRIORITY_AUTO, timeout: float | None = None):
+        await self.acquire(tokens, priority, timeout)
+        lease = Lease(tokens)
+        try:
+            yield lease
+        except THROTTLE_ERRORS as e:
+            self._release(lease, throttled=True, delay=retry_after(e))
+            raise
+        except BaseException:
+            self._release()
+            raise
+        else:
+            self._release(lease)
+
+_default_limiter = AdaptiveRateLimiter()
+
+def get_model_limiter(bot) -> AdaptiveRateLimiter:
+    cog = bot.get_cog('RateLimiterCog') if bot is not None else None
+    return cog.model_limiter if cog is not None else _default_limiter
+
+class RateLimiterCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.model_limiter = AdaptiveRateLimiter()
+
+def setup(bot):
+    bot.add_cog(RateLimiterCog(bot))
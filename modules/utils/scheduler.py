@@ -0,0 +1,139 @@
+# modules.utils.scheduler
+
+from typing import Any, Callable, Dict, Hashable, List
+from collections import deque
+import asyncio
+import logging
+import time
+
+class Lane:
+    __slots__ = ('jobs', 'timer', 'scheduled', 'busy', 'dispatched', 'dropped', 'merged', 'avg_wait', 'max_wait')
+
+    def __init__(self):
+        self.jobs: deque = deque()
+        self.timer = None
+        self.scheduled = False
+        self.busy = False
+        self.dispatched = 0
+        self.dropped = 0
+        self.merged = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, wait: float):
+        self.dispatched += 1
+        self.avg_wait = wait if self.dispatched == 1 else self.avg_wait * 0.8 + wait * 0.2
+        self.max_wait = max(self.max_wait, wait)
+
+class KeyedScheduler:
+    """Ordered per-key lanes dispatched round-robin, one batch per lane at a time"""
+
+    def __init__(
+        self,
+        batch_window: float,
+        max_batch_size: int,
+        max_lane_depth: int,
+        merge: Callable[[Any, Any], Any] | None = None,
+        on_drop: Callable[[Any], None] | None = None
+    ):
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_lane_depth = max_lane_depth
+        self.merge = merge
+        self.on_drop = on_drop
+        self._lanes: Dict[Hashable, Lane] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self.totals = {'queued': 0, 'dispatched': 0, 'dropped': 0, 'merged': 0}
+
+    def __len__(self) -> int:
+        return sum(len(lane.jobs) for lane in self._lanes.values())
+
+    def put(self, key: Hashable, job: Any):
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = Lane()
+        lane.jobs.append((time.monotonic(), job))
+        self.totals['queued'] += 1
+        if len(lane.jobs) > self.max_lane_depth:
+            self._shed(key, lane)
+        if lane.busy or lane.scheduled:
+            return
+        if len(lane.jobs) >= self.max_batch_size:
+            self._schedule(key, lane)
+        elif lane.timer is None:
+            lane.timer = asyncio.get_running_loop().call_later(self.batch_window, self._schedule, key, lane)
+
+    def _shed(self, key: Hashable, lane: Lane):
+        (oldest_at, oldest), (_, second) = lane.jobs[0], lane.jobs[1]
+        merged = self.merge(oldest, second) if self.merge else None
+        lane.jobs.popleft()
+        if merged is not None:
+            lane.jobs[0] = (oldest_at, merged)
+            lane.merged += 1
+            self.totals['merged'] += 1
+        else:
+            lane.dropped += 1
+            self.totals['dropped'] += 1
+            if self.on_drop:
+                self.on_drop(oldest)
+            logging.warning(f"Scheduler lane {key} exceeded {self.max_lane_depth} jobs, dropped the oldest")
+
+    def _schedule(self, key: Hashable, lane: Lane):
+        if lane.timer is not None:
+            lane.timer.cancel()
+            lane.timer = None
+        if lane.scheduled or lane.busy or self._lanes.get(key) is not lane:
+            return
+        lane.scheduled = True
+        self._ready.put_nowait(key)
+
+    async def get(self) -> tuple[Hashable, List[Any]]:
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes.get(key)
+            if lane is None or not lane.scheduled:
+                continue
+            lane.scheduled = False
+            lane.busy = True
+            now = time.monotonic()
+            batch = []
+            while lane.jobs and len(batch) < self.max_batch_size:
+                enqueued_at, job = lane.jobs.popleft()
+                lane.record_wait(now - enqueued_at)
+                batch.append(job)
+            self.totals['dispatched'] += len(batch)
+            return key, batch
+
+    def release(self, key: Hashable):
+        lane = self._lanes.get(key)
+        if lane is None:
+            return
+        lane.busy = False
+        if lane.jobs:
+            self._schedule(key, lane)
+        else:
+            del self._lanes[key]
+
+    def lane_metrics(self, key: Hashable) -> Dict[str, float] | None:
+        lane = self._lanes.get(key)
+        if lane is None:
+            return None
+        oldest_wait = time.monotonic() - lane.jobs[0][0] if lane.jobs else 0.0
+        return {
+            'depth': len(lane.jobs),
+            'oldest_wait': oldest_wait,
+            'avg_wait': lane.avg_wait,
+            'max_wait': lane.max_wait,
+            'dropped': lane.dropped,
+            'merged': lane.merged,
+        }
+
+    def metrics(self) -> Dict[Hashable, Dict[str, float]]:
+        return {key: self.lane_metrics(key) for key in self._lanes}
+
+    def clear(self):
+        for lane in self._lanes.values():
+            if lane.timer is not None:
+                lane.timer.cancel()
+        self._lanes.clear()
+        self._ready = asyncio.Queue()
@@ -0,0 +1,74 @@
+# modules.utils.segments
+
+from typing import Dict, List
+import re
+
+PLACEHOLDER = '[[{}]]'
+PLACEHOLDER_PATTERN = re.compile(r'\[\[(\d+)\]\]')
+
+CODE_BLOCK = re.compile(r'```.*?```', re.DOTALL)
+LOG_LINE = re.compile(
+    r'^\s*(?:'
+    r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}'
+    r'|\d{2}:\d{2}:\d{2}[.,]\d+'
+    r'|\[?(?:TRACE|DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\]?[:\s]'
+    r'|Traceback \(most recent call last\)'
+    r'|File ".+", line \d+'
+    r'|at [\w$.<>]+\(.*\)\s*$'
+    r'|[\w.]+(?:Error|Exception):'
+    r')'
+)
+INLINE_PATTERNS = [
+    re.compile(r'`[^`\n]+`'),
+    re.compile(r'<a?:\w+:\d+>'),
+    re.compile(r'<(?:@[!&]?|#)\d+>'),
+    re.compile(r'https?://\S+'),
+    re.compile(r'\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{7,64}\b', re.IGNORECASE),
+    re.compile(r'(?<!\S):[a-z_][a-z0-9_+-]*:(?![^\s.,!?])', re.IGNORECASE),
+]
+
+def segment(text: str) -> tuple[str, List[str]]:
+    """Swap code, logs, links, emoji markup and hashes for numbered placeholders"""
+    if PLACEHOLDER_PATTERN.search(text):
+        return text, []
+    spans: List[str] = []
+
+    def hold(span: str) -> str:
+        spans.append(span)
+        return PLACEHOLDER.format(len(spans))
+
+    text = CODE_BLOCK.sub(lambda match: hold(match.group(0)), text)
+    lines, run = [], []
+    for line in text.split('\n'):
+        if LOG_LINE.match(line):
+            run.append(line)
+            continue
+        if run:
+            lines.append(hold('\n'.join(run)))
+            run = []
+        lines.append(line)
+    if run:
+        lines.append(hold('\n'.join(run)))
+    text = '\n'.join(lines)
+    for pattern in INLINE_PATTERNS:
+        text = pattern.sub(lambda match: hold(match.group(0)), text)
+    return text, spans
+
+def restore(text: str, spans: List[str]) -> str:
+    if not spans:
+        return text
+
+    def put_back(match: re.Match) -> str:
+        index = int(match.group(1))
+        return spans[index - 1] if 0 < index <= len(spans) else match.group(0)
+
+    return PLACEHOLDER_PATTERN.sub(put_back, text)
+
+def restore_all(translations: Dict[str, str], spans: List[str]) -> Dict[str, str]:
+    if not spans:
+        return translations
+    return {lang: restore(text, spans) for lang, text in translations.items()}
+
+def strip(text: str) -> str:
+    text, spans = segment(text)
+    return PLACEHOLDER_PATTERN.sub(' ', text) if spans else text
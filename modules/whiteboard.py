@@ -1,4 +1,5 @@
 from disnake import TextInputStyle, ui, Message, Embed, Color
+from modules.utils.messages import fetch_message
 from core import is_admin_or_privileged
 from disnake.ext import commands
 
@@ -18,7 +19,7 @@ class WhiteboardCog(commands.Cog):
 
     @whiteboard.sub_command(name="edit")
     async def edit_by_id(self, inter, message_id):
-        message = await inter.channel.fetch_message(int(message_id))
+        message = await fetch_message(self.client, inter.channel, int(message_id))
         await self._handle_edit(inter, message)
 
     @commands.message_command(name="Edit Whiteboard")